@@ -1,9 +1,11 @@
 import os
 import sys
+import json
+import time
 import logging
 from pathlib import Path
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
@@ -11,11 +13,17 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(BASE_DIR)
 
 from pipeline import AITextSorterPipeline
+from jobs.job_queue import JobQueue, QueueFullError, FINISHED
+from cache.result_cache import file_hash
+from upload_staging import staging_request_class, place_file, reclaim_stale
 
 app = Flask(__name__)
 CORS(app)
 
-UPLOAD_FOLDER = Path(BASE_DIR) / 'uploads'
+pipeline = AITextSorterPipeline()
+storage_config = pipeline.config.get('storage', {})
+
+UPLOAD_FOLDER = Path(BASE_DIR) / storage_config.get('upload_folder', 'uploads')
 UPLOAD_FOLDER.mkdir(parents=True, exist_ok=True)
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'tiff', 'pdf'}
@@ -24,21 +32,75 @@ MAX_FILE_SIZE = 16 * 1024 * 1024  # 16 MB
 app.config['UPLOAD_FOLDER'] = str(UPLOAD_FOLDER)
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
-pipeline = AITextSorterPipeline()
+# Uploads stream straight into uploads/, hashed on the way (and kept in memory when small)
+app.request_class = staging_request_class(str(UPLOAD_FOLDER), storage_config.get('upload_memory_mb', 16) * 1024 * 1024)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def process_upload(filepath, content_hash=None, image_bytes=None):
+    """Process an upload, moving it into sorted_documents/; a failed upload is deleted"""
+    try:
+        result = pipeline.process_document(filepath, content_hash, image_bytes, move_source=True)
+    except Exception:
+        remove_upload(filepath)
+        raise
+    if not result.get('success'):
+        remove_upload(filepath)
+    return result
+
+def remove_upload(filepath):
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+job_queue = JobQueue(process_upload, pipeline.config.get('jobs', {}))
+
+def reclaim_uploads():
+    """Delete files left by interrupted uploads, and uploads already copied into sorted_documents/
+
+    The copies date from before uploads were moved into place. Uploads that a
+    queued or running job still needs are left alone.
+    """
+    organized = {}  # size -> paths, so only same-size files are hashed
+    for path in Path(storage_config.get('output_folder', 'sorted_documents')).rglob('*'):
+        if path.is_file():
+            organized.setdefault(path.stat().st_size, []).append(path)
+    pending = {os.path.basename(path) for path in job_queue.store.pending_inputs()}
+
+    def organized_copy(name):
+        if not allowed_file(name) or name in pending:
+            return False
+        path = UPLOAD_FOLDER / name
+        candidates = organized.get(path.stat().st_size)
+        if not candidates:
+            return False
+        digest = file_hash(path)
+        return any(file_hash(candidate) == digest for candidate in candidates)
+
+    freed = reclaim_stale(str(UPLOAD_FOLDER), storage_config.get('stale_upload_hours', 1) * 3600, organized_copy)
+    if freed:
+        logging.info(f'Reclaimed {freed / (1024 * 1024):.1f} MB of stale uploads')
+
+reclaim_uploads()
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'healthy',
         'time': datetime.utcnow().isoformat(),
-        'pipeline_ready': pipeline is not None
+        'pipeline_ready': pipeline is not None,
+        'cache': pipeline.cache_stats(),
+        'duplicates': pipeline.duplicate_stats(),
+        'job_queue_depth': job_queue.depth(),
+        'model_load_seconds': pipeline.model_load_times(),
+        'ocr': pipeline.ocr_engine.get_stats(),
+        'correction': pipeline.correction_stats(),
+        'llm': pipeline.llm_stats()
     })
 
-@app.route('/api/process', methods=['POST'])
-def process_document():
+def validate_upload():
     if 'file' not in request.files:
         return jsonify({'success': False, 'error': 'No file part'}), 400
 
@@ -49,18 +111,26 @@ def process_document():
     if not allowed_file(file.filename):
         allowed = ", ".join(ALLOWED_EXTENSIONS)
         return jsonify({'success': False, 'error': f'File type not allowed. Allowed: {allowed}'}), 400
+    return None
 
-    try:
-        filename = secure_filename(file.filename)
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_')
-        unique_filename = timestamp + filename
-        filepath = UPLOAD_FOLDER / unique_filename
-        file.save(filepath)
+def save_upload(file):
+    # The request already streamed the file into uploads/; this only links it under its name
+    filename = secure_filename(file.filename)
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_')
+    unique_filename = place_file(file.stream.finish(), str(UPLOAD_FOLDER), timestamp + filename)
+    return UPLOAD_FOLDER / unique_filename
 
-        result = pipeline.process_document(str(filepath))
+@app.route('/api/process', methods=['POST'])
+def process_document():
+    error = validate_upload()
+    if error:
+        return error
+
+    try:
+        file = request.files['file']
+        filepath = save_upload(file)
 
-        # Optionally clean up the uploaded file after processing
-        # os.remove(filepath)
+        result = process_upload(str(filepath), file.stream.sha256, file.stream.data)
 
         if result.get('success'):
             return jsonify({'success': True, 'data': result}), 200
@@ -71,11 +141,142 @@ def process_document():
         logging.exception('Error processing document')
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    error = validate_upload()
+    if error:
+        return error
+
+    if job_queue.depth() >= job_queue.max_queue_depth:
+        return jsonify({'success': False, 'error': 'Job queue is full, retry later'}), 429
+
+    filepath = None
+    try:
+        filepath = save_upload(request.files['file'])
+        job_id = job_queue.submit(str(filepath))
+    except QueueFullError as e:
+        remove_upload(filepath)
+        return jsonify({'success': False, 'error': str(e)}), 429
+    except Exception as e:
+        logging.exception('Error queuing document')
+        if filepath is not None:
+            remove_upload(filepath)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'queued'}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # ?wait=N long-polls for up to N seconds until the job finishes
+    deadline = time.monotonic() + min(request.args.get('wait', 0, type=float), 60)
+    job = job_queue.get(job_id)
+    while job and job['status'] not in FINISHED and time.monotonic() < deadline:
+        job = job_queue.wait(job_id, job['status'], timeout=deadline - time.monotonic())
+
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job(job_id):
+    if job_queue.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+
+    def events():
+        status = None
+        while True:
+            job = job_queue.wait(job_id, status, timeout=15)
+            if job['status'] == status:
+                yield ': keep-alive\n\n'
+                continue
+            status = job['status']
+            yield f"event: {status}\ndata: {json.dumps(job, default=str)}\n\n"
+            if status in FINISHED:
+                return
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.errorhandler(413)
 def request_entity_too_large(error):
     return jsonify({'success': False, 'error': f"File too large. Max size {MAX_FILE_SIZE // (1024*1024)} MB."}), 413
 
+def preload():
+    """Load every model and recover interrupted jobs in the parent, before workers are forked"""
+    import gc
+    logging.info(f'Preloaded models: {pipeline.warm_up()}')
+    job_queue.store.requeue_interrupted()
+    # Move the preloaded objects out of the collector's reach so GC passes in
+    # the workers don't write to (and thereby copy) their pages
+    gc.freeze()
+
+def drain(timeout):
+    """Let running jobs and deferred corrections finish, for up to ``timeout`` seconds in total
+
+    Queued jobs stay queued and run after the next start.
+    """
+    deadline = time.monotonic() + timeout
+    jobs_done = job_queue.stop(timeout)
+    corrections_done = pipeline.correction_gate.drain(max(0, deadline - time.monotonic()))
+    if not (jobs_done and corrections_done):
+        logging.warning('Shutting down with work still running; interrupted jobs are re-queued at the next start')
+
+def serve_preforked(host, port, workers):
+    """Load every model once, then fork workers that share the weights copy-on-write."""
+    import signal
+    import socket
+    from werkzeug.serving import make_server
+
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('Pre-forked workers need os.fork; run a single worker on this platform')
+
+    preload()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            job_queue.start(recover=False)
+            make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+            os._exit(0)
+        children.append(pid)
+
+    print(f"Serving AI Text Sorter API on http://{host}:{port} with {workers} pre-forked workers")
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
 if __name__ == '__main__':
+    import argparse
+    # Development server; serve.py runs the app under gunicorn for production
+    server_config = pipeline.config.get('server', {})
+    host = server_config.get('host', '127.0.0.1')
+    port = server_config.get('port', 5000)
+    debug = pipeline.config.get('app', {}).get('debug', False)
+
+    parser = argparse.ArgumentParser(description="AI Text Sorter API server")
+    parser.add_argument('--workers', type=int, default=1, help='Fork this many workers after preloading models')
+    parser.add_argument('--preload', action='store_true', help='Load all models before accepting requests')
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO)
-    print("Starting AI Text Sorter API server on http://127.0.0.1:5000")
-    app.run(host='127.0.0.1', port=5000, debug=True)
+    if args.workers > 1:
+        serve_preforked(host, port, args.workers)
+    else:
+        # The debug reloader runs this script twice; only the serving child
+        # (WERKZEUG_RUN_MAIN) loads models and runs jobs
+        if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            if args.preload:
+                logging.info(f'Preloaded models: {pipeline.warm_up()}')
+            job_queue.start()
+        print(f"Starting AI Text Sorter API server on http://{host}:{port}")
+        app.run(host=host, port=port, debug=debug)
@@ -0,0 +1,116 @@
+"""Compare OCR latency and accuracy of the original and the new preprocessing path.
+
+Usage:
+    python benchmarks/bench_preprocessing.py --input-dir uploads [--engine tesseract] [--json out.json]
+
+If an image has a ``<name>.txt`` file next to it, that text is used as ground
+truth and accuracy is reported as the difflib similarity to it. Without ground
+truth only latency and the agreement between both paths are reported.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from difflib import SequenceMatcher
+from pathlib import Path
+
+import cv2
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+from preprocessing.image_enhancer import ImageEnhancer
+from extraction.ocr_engine import MultiOCREngine
+from batch.batch_engine import iter_image_files
+
+
+def legacy_enhance(image_path):
+    # The pre-pipeline ImageEnhancer.enhance: full resolution, 3-channel output
+    image = cv2.imread(image_path)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    enhanced = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2)
+    return cv2.cvtColor(enhanced, cv2.COLOR_GRAY2BGR)
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, ' '.join(a.split()), ' '.join(b.split())).ratio()
+
+
+def run_path(enhance, ocr, image_path):
+    start = time.perf_counter()
+    image = enhance(image_path)
+    enhanced_at = time.perf_counter()
+    text = ocr.extract_text(image)['text']
+    return {'enhance': enhanced_at - start, 'ocr': time.perf_counter() - enhanced_at,
+            'bytes': int(image.nbytes), 'text': text}
+
+
+def summarize(runs, key):
+    values = [run[key] for run in runs]
+    return {'mean': statistics.mean(values), 'median': statistics.median(values), 'max': max(values)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input-dir', required=True)
+    parser.add_argument('--engine', default='easyocr', choices=['easyocr', 'tesseract'])
+    parser.add_argument('--limit', type=int, default=0)
+    parser.add_argument('--json', help='Write the full report to this file')
+    args = parser.parse_args()
+
+    import yaml
+    with open(os.path.join(BASE_DIR, 'config', 'config.yaml')) as f:
+        config = yaml.safe_load(f)
+
+    enhancer = ImageEnhancer(config.get('preprocessing', {}))
+    ocr = MultiOCREngine({**config.get('ocr', {}), 'primary_engine': args.engine, 'fallback_engine': None})
+    ocr.warm_up()
+
+    images = list(iter_image_files(args.input_dir))
+    if args.limit:
+        images = images[:args.limit]
+
+    report = {'engine': args.engine, 'images': len(images), 'documents': []}
+    legacy_runs, new_runs = [], []
+    for path in images:
+        legacy = run_path(legacy_enhance, ocr, str(path))
+        new = run_path(enhancer.enhance, ocr, str(path))
+        entry = {'image': str(path), 'legacy': legacy, 'new': new,
+                 'agreement': similarity(legacy['text'], new['text'])}
+
+        truth_path = Path(path).with_suffix('.txt')
+        if truth_path.exists():
+            truth = truth_path.read_text(encoding='utf-8')
+            legacy['accuracy'] = similarity(truth, legacy['text'])
+            new['accuracy'] = similarity(truth, new['text'])
+        legacy_runs.append(legacy)
+        new_runs.append(new)
+        report['documents'].append(entry)
+
+    if images:
+        for name, runs in (('legacy', legacy_runs), ('new', new_runs)):
+            report[name] = {key: summarize(runs, key) for key in ('enhance', 'ocr', 'bytes')}
+            scored = [run['accuracy'] for run in runs if 'accuracy' in run]
+            if scored:
+                report[name]['accuracy'] = statistics.mean(scored)
+        report['agreement'] = statistics.mean(entry['agreement'] for entry in report['documents'])
+
+        for name in ('legacy', 'new'):
+            summary = report[name]
+            print(f"{name:>6}: enhance {summary['enhance']['mean'] * 1000:7.1f} ms  "
+                  f"ocr {summary['ocr']['mean'] * 1000:8.1f} ms  "
+                  f"buffer {summary['bytes']['mean'] / 1e6:6.2f} MB  "
+                  f"accuracy {summary.get('accuracy', float('nan')):.3f}")
+        print(f"agreement between paths: {report['agreement']:.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Per-stage latency of the pipeline: preprocessing, both OCR engines, classification and organizing.
+
+Usage:
+    python benchmarks/bench_stages.py [--input-dir corpus] [--repeat 3] [--json stages.json]
+
+Without ``--input-dir`` a synthetic handwritten-note corpus is generated
+(bench.corpus). Stages whose engine or model isn't installed are reported
+as skipped. The JSON report has p50/p95/p99 per stage and can be compared
+with ``python -m bench.compare`` from the repository root.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+# Repository root, for the shared bench package
+sys.path.append(os.path.dirname(BASE_DIR))
+
+from preprocessing.image_enhancer import ImageEnhancer
+from extraction.ocr_engine import MultiOCREngine
+from classification.text_classifier import SmartTextClassifier
+from batch.batch_engine import iter_image_files
+from bench.corpus import generate_corpus
+from bench.stats import summarize, environment, write_report, print_table
+
+
+def measure(call, inputs, repeat):
+    """Summary of ``call(input)`` over every input, ``repeat`` times; stops at the first failure"""
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            try:
+                call(item)
+            except Exception as e:
+                return {'skipped': f'{type(e).__name__}: {e}'}
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def bench_ocr(config, name, images, repeat):
+    try:
+        ocr = MultiOCREngine({**config.get('ocr', {}), 'mode': 'single', 'primary_engine': name,
+                              'fallback_engine': None})
+    except RuntimeError as e:
+        return {'skipped': str(e)}
+    # The engine falls back to whatever is installed; that isn't the engine asked for
+    if ocr.enabled[0] != name:
+        return {'skipped': f'{name} is not installed'}
+    try:
+        ocr.warm_up()
+    except Exception as e:
+        return {'skipped': f'{type(e).__name__}: {e}'}
+    return measure(ocr.extract_text, images, repeat)
+
+
+def build_pipeline(config, scratch):
+    """A pipeline writing into ``scratch``, for organize_document; raises if it can't be built here"""
+    from pipeline import AITextSorterPipeline
+    os.environ.setdefault('PERPLEXITY_API_KEY', 'unused')  # nothing is sent
+    config = {**config, 'storage': {**config.get('storage', {}), 'output_folder': os.path.join(scratch, 'sorted'),
+                                    'log_folder': os.path.join(scratch, 'logs')},
+              'cache': {**config.get('cache', {}), 'path': os.path.join(scratch, 'cache', 'results.db')},
+              'dedup': {**config.get('dedup', {}), 'path': os.path.join(scratch, 'cache', 'duplicates.db')}}
+    config_path = os.path.join(scratch, 'config.yaml')
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+    pipeline = AITextSorterPipeline(config_path)
+    logging.getLogger().setLevel(logging.WARNING)
+    return pipeline
+
+
+def bench_organize(pipeline, paths, repeat, scratch, move_source):
+    category = {'category': 'bench'}
+    if not move_source:
+        return measure(lambda path: pipeline.organize_document(path, category), paths, repeat)
+
+    # Moving consumes the source, so each call gets a fresh copy made outside the timing
+    latencies = []
+    for _ in range(repeat):
+        for path in paths:
+            source = os.path.join(scratch, 'upload_' + os.path.basename(path))
+            shutil.copy2(path, source)
+            start = time.perf_counter()
+            pipeline.organize_document(source, category, move_source=True)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input-dir', help='Images to benchmark with (default: a generated synthetic corpus)')
+    parser.add_argument('--corpus-size', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='Write the report to this file (default: stdout)')
+    args = parser.parse_args()
+
+    with open(os.path.join(BASE_DIR, 'config', 'config.yaml')) as f:
+        config = yaml.safe_load(f)
+
+    scratch = tempfile.mkdtemp(prefix='bench-stages-')
+    try:
+        input_dir = args.input_dir or os.path.join(scratch, 'corpus')
+        if not args.input_dir:
+            generate_corpus(input_dir, args.corpus_size)
+        paths = [str(path) for path in iter_image_files(input_dir)]
+        texts = []
+        for path in paths:
+            truth = os.path.splitext(path)[0] + '.txt'
+            if os.path.exists(truth):
+                with open(truth, encoding='utf-8') as f:
+                    texts.append(f.read())
+
+        enhancer = ImageEnhancer(config.get('preprocessing', {}))
+        results = {'ImageEnhancer.enhance': measure(enhancer.enhance, paths, args.repeat)}
+
+        # OCR engines get the preprocessed pages, as in the pipeline
+        enhanced = [enhancer.enhance(path) for path in paths]
+        for name in ('tesseract', 'easyocr'):
+            results[f'MultiOCREngine {name}'] = bench_ocr(config, name, enhanced, args.repeat)
+
+        classifier = SmartTextClassifier(config.get('nlp', {}))
+        if not texts:
+            results['SmartTextClassifier.classify'] = {'skipped': 'no ground-truth .txt files to classify'}
+        elif not classifier.warm_up():
+            results['SmartTextClassifier.classify'] = {'skipped': 'zero-shot model unavailable'}
+        else:
+            results['SmartTextClassifier.classify'] = measure(classifier.classify, texts, args.repeat)
+
+        try:
+            pipeline = build_pipeline(config, scratch)
+            results['organize_document copy'] = bench_organize(pipeline, paths, args.repeat, scratch, False)
+            results['organize_document move'] = bench_organize(pipeline, paths, args.repeat, scratch, True)
+        except Exception as e:
+            results['organize_document'] = {'skipped': f'{type(e).__name__}: {e}'}
+
+        report = {'benchmark': 'stages', 'params': {'images': len(paths), 'repeat': args.repeat,
+                                                    'input_dir': args.input_dir},
+                  'environment': environment(), 'results': results}
+        print_table(results)
+        write_report(report, args.json)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Per-page latency of the Tesseract paths in MultiOCREngine.
+
+Usage:
+    python benchmarks/bench_tesseract.py --input-dir uploads [--repeat 3] [--json out.json]
+
+Compares the original two-call path (image_to_string + image_to_data), the
+single-pass pytesseract path and, if tesserocr is installed, the persistent
+API-handle path. Every path gets the same preprocessed image.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import cv2
+import pytesseract
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(BASE_DIR, 'src'))
+
+from preprocessing.image_enhancer import ImageEnhancer
+from extraction.ocr_engine import MultiOCREngine, TESSEROCR
+from batch.batch_engine import iter_image_files
+
+
+def legacy_tesseract(image):
+    # The original _tesseract: two recognition passes over the same page
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB) if image.ndim == 2 else image
+    text = pytesseract.image_to_string(rgb_image)
+    pytesseract.image_to_data(rgb_image, output_type=pytesseract.Output.DICT)
+    return text
+
+
+def time_pages(ocr_page, images, repeat):
+    timings = []
+    for image in images:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ocr_page(image)
+            timings.append(time.perf_counter() - start)
+    return {'mean_ms': statistics.mean(timings) * 1000, 'median_ms': statistics.median(timings) * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input-dir', required=True)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--limit', type=int, default=0)
+    parser.add_argument('--json', help='Write the report to this file')
+    args = parser.parse_args()
+
+    paths = list(iter_image_files(args.input_dir))
+    if args.limit:
+        paths = paths[:args.limit]
+    enhancer = ImageEnhancer()
+    images = [enhancer.enhance(str(path)) for path in paths]
+    if not images:
+        parser.error(f'No images found in {args.input_dir}')
+
+    paths_to_time = {
+        'two_pass': legacy_tesseract,
+        'single_pass': MultiOCREngine({'primary_engine': 'tesseract', 'tesseract_backend': 'pytesseract'}).extract_text,
+    }
+    if TESSEROCR:
+        engine = MultiOCREngine({'primary_engine': 'tesseract', 'tesseract_backend': 'tesserocr'})
+        engine.warm_up()
+        paths_to_time['tesserocr'] = engine.extract_text
+
+    report = {'pages': len(images), 'repeat': args.repeat}
+    for name, ocr_page in paths_to_time.items():
+        report[name] = time_pages(ocr_page, images, args.repeat)
+        saving = 1 - report[name]['mean_ms'] / report['two_pass']['mean_ms']
+        report[name]['saving_vs_two_pass'] = saving
+        print(f"{name:>12}: {report[name]['mean_ms']:8.1f} ms/page  ({saving:.0%} saved vs two-pass)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Gunicorn settings for the API, read from the ``server`` section of config/config.yaml
+
+    gunicorn -c gunicorn.conf.py api_server:app
+
+(or ``python serve.py``). Command-line options override these settings.
+"""
+import os
+import sys
+import time
+import signal
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+with open(os.getenv('AI_TEXT_SORTER_CONFIG', os.path.join(BASE_DIR, 'config', 'config.yaml')), 'r') as file:
+    _config = yaml.safe_load(file)
+_server = _config.get('server', {})
+
+chdir = BASE_DIR
+bind = f"{_server.get('host', '127.0.0.1')}:{_server.get('port', 5000)}"
+workers = _server.get('workers', 2)
+threads = _server.get('threads', 4)
+worker_class = 'gthread'
+preload_app = _server.get('preload', True)
+timeout = _server.get('timeout', 300)
+graceful_timeout = _server.get('graceful_timeout', 120)
+max_requests = _server.get('max_requests', 0)
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        # The app was imported in the master already: load the models here, once,
+        # and every worker forked afterwards shares them
+        import api_server
+        api_server.preload()
+    else:
+        # Workers load everything themselves; the master only re-queues jobs interrupted by the last shutdown
+        sys.path.append(os.path.join(BASE_DIR, 'src'))
+        from jobs.job_queue import JobStore
+        JobStore(_config.get('jobs', {}).get('db_path', 'jobs/jobs.db')).requeue_interrupted()
+
+
+def post_fork(server, worker):
+    import api_server
+    api_server.job_queue.start(recover=False)
+
+
+def post_worker_init(worker):
+    # Note when the master asks this worker to stop, so worker_exit knows how much
+    # of the graceful timeout in-flight requests have used up
+    handle_exit = worker.handle_exit
+
+    def stop_requested(sig, frame):
+        if not hasattr(worker, 'stop_requested_at'):
+            worker.stop_requested_at = time.monotonic()
+        handle_exit(sig, frame)
+
+    signal.signal(signal.SIGTERM, stop_requested)
+
+
+def worker_exit(server, worker):
+    # In-flight requests are done by now. Running jobs and deferred corrections get the
+    # rest of the graceful timeout; the master kills the worker once it's over
+    import api_server
+    elapsed = time.monotonic() - getattr(worker, 'stop_requested_at', time.monotonic())
+    api_server.drain(max(0, server.cfg.graceful_timeout - elapsed))
@@ -1,3 +1,4 @@
+import io
 import os
 import yaml
 import logging
@@ -7,17 +8,24 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 import sys
 sys.path.append(os.path.join(BASE_DIR, 'src'))
+# Repository root, for the llm_client package shared with the other backends
+sys.path.append(os.path.dirname(BASE_DIR))
 
 from preprocessing.image_enhancer import ImageEnhancer
 from extraction.ocr_engine import MultiOCREngine
 from classification.text_classifier import SmartTextClassifier
 from classification.category_manager import CategoryManager
 from vlm.perplexity_client import PerplexityVisionClient
+from vlm.correction_gate import CorrectionGate
+from batch.batch_engine import BatchEngine, iter_image_files
+from cache.result_cache import ResultCache, file_hash, text_hash
+from image_dedup import DuplicateIndex
+from upload_staging import place_file
 
 class AITextSorterPipeline:
     def __init__(self, config_path=None):
         if config_path is None:
-            config_path = os.path.join(BASE_DIR, 'config', 'config.yaml')
+            config_path = os.getenv('AI_TEXT_SORTER_CONFIG', os.path.join(BASE_DIR, 'config', 'config.yaml'))
 
         if not os.path.isfile(config_path):
             raise FileNotFoundError(f"Config file not found at {config_path}")
@@ -31,7 +39,42 @@ class AITextSorterPipeline:
         self.ocr_engine = MultiOCREngine(self.config.get('ocr', {}))
         self.text_classifier = SmartTextClassifier(self.config.get('nlp', {}))
         self.category_manager = CategoryManager(self.config.get('classification', {}))
-        self.vlm_client = PerplexityVisionClient()
+        self.vlm_client = PerplexityVisionClient(llm_config=self.config.get('llm', {}))
+        self.correction_gate = CorrectionGate(self.config.get('correction', {}))
+
+        # Each stage is cached under the config that produced it, so changing one
+        # stage's settings leaves the other stages' cached results usable
+        self.result_cache = ResultCache(self.config.get('cache', {}))
+        self.stage_configs = {
+            'ocr': {'preprocessing': self.config.get('preprocessing', {}), 'ocr': self.config.get('ocr', {})},
+            'correction': {'model': self.vlm_client.model},
+            'classification': {'nlp': self.config.get('nlp', {}),
+                               'model': self.text_classifier.zero_shot_model,
+                               'classification': self.config.get('classification', {}),
+                               'categories': self.category_manager.categories_config}
+        }
+
+        # Near-duplicates of an organized document reuse its result; entries made
+        # under a different classification config are not reused
+        dedup_config = self.config.get('dedup', {})
+        self.duplicates = None
+        if dedup_config.get('enabled', True):
+            self.duplicates = DuplicateIndex(dedup_config.get('path', 'cache/duplicates.db'),
+                                             dedup_config.get('max_distance', 16), dedup_config.get('hash_size', 16))
+        self.link_identical = dedup_config.get('link_identical', True)
+        self.dedup_fingerprint = ResultCache.make_key('dedup', self.stage_configs['classification'])
+
+    def warm_up(self):
+        # Load every configured model now instead of on the first document
+        self.ocr_engine.warm_up()
+        self.text_classifier.warm_up()
+        return self.model_load_times()
+
+    def model_load_times(self):
+        times = {f'ocr.{name}': round(seconds, 3) for name, seconds in self.ocr_engine.load_seconds.items()}
+        times.update({f'classifier.{name}': round(seconds, 3)
+                      for name, seconds in self.text_classifier.load_seconds.items()})
+        return times
 
     def setup_logging(self):
         log_folder = self.config.get('storage', {}).get('log_folder', 'logs')
@@ -46,35 +89,211 @@ class AITextSorterPipeline:
         )
         self.logger = logging.getLogger(__name__)
 
-    def process_document(self, image_path):
+    def process_document(self, image_path, content_hash=None, image_bytes=None, move_source=False):
+        """Process and organize one image
+
+        Uploads pass the SHA-256 taken while the file was streamed in, and the
+        bytes too when they were small enough to keep in memory, so the image is
+        decoded without reading it back. With ``move_source`` the file itself is
+        moved into ``sorted_documents/`` instead of copied.
+        """
         self.logger.info(f'Processing image: {image_path}')
 
-        # Step 1: Enhance image
-        enhanced_image = self.image_enhancer.enhance(image_path)
+        # A near-duplicate of an organized document skips OCR, correction and classification
+        image_hash, duplicate = self.lookup_duplicate(image_path, image_bytes)
+        if duplicate is not None:
+            return self.finish_duplicate(image_path, image_hash, duplicate, content_hash, move_source)
 
-        # Step 2: Extract text with OCR
-        ocr_result = self.ocr_engine.extract_text(enhanced_image)
+        # Steps 1-2: Enhance image and extract text with OCR (unless cached)
+        content_hash, ocr_result = self.lookup_ocr(image_path, content_hash)
+        if ocr_result is None:
+            enhanced_image, timings = self.image_enhancer.enhance_with_timings(
+                image_bytes if image_bytes is not None else image_path)
+            self.logger.debug(f"Preprocessing timings: { {step: round(t, 4) for step, t in timings.items()} }")
+            ocr_result = self.ocr_engine.extract_text(enhanced_image)
+            self.store_ocr(content_hash, ocr_result)
         raw_text = ocr_result['text']
 
         if not raw_text.strip():
             return {'success': False, 'error': 'No text extracted from OCR'}
 
         # Step 3: Refine text with Vision-Language Model (NLM)
+        corrected_text, deferred = self.correct_text(image_path, raw_text, ocr_result['confidence'])
+
+        # Step 4: Classification on corrected (or fallback) text, keywords first
+        classification = self.classify_text(corrected_text)
+
+        # Steps 5-6: Assign category and organize document into proper folder
+        result = self.finish_document(image_path, raw_text, corrected_text, classification, image_hash,
+                                      content_hash, move_source, defer_correction=deferred)
+        result['ocr_engine'] = ocr_result.get('engine')
+        result['ocr_engine_latency'] = ocr_result.get('engine_latency', {})
+        return result
+
+    def lookup_duplicate(self, image_path, image_bytes=None):
+        """Perceptual hash of the image and the stored result of an organized near-duplicate, if any"""
+        if self.duplicates is None:
+            return None, None
+        try:
+            image_hash = self.duplicates.hash_image(io.BytesIO(image_bytes) if image_bytes is not None else image_path)
+        except Exception as e:
+            self.logger.warning(f"Could not hash {image_path} for duplicate lookup: {e}")
+            return None, None
+
+        def reusable(entry):
+            return entry['fingerprint'] == self.dedup_fingerprint and os.path.exists(entry['final_path'])
+
+        return image_hash, self.duplicates.find(image_hash, reusable)
+
+    def finish_duplicate(self, image_path, image_hash, duplicate, content_hash=None, move_source=False):
+        self.logger.info(f"{image_path} is a near-duplicate of {duplicate['final_path']} "
+                         f"({duplicate['distance']} bits apart), reusing its result")
+        content_hash = content_hash or file_hash(image_path)
+        identical = self.link_identical and content_hash == duplicate['sha256']
+        final_path = self.organize_document(image_path, duplicate['category'],
+                                            link_to=duplicate['final_path'] if identical else None,
+                                            move_source=move_source)
+        result = {
+            'success': True,
+            'original_text': duplicate['original_text'],
+            'corrected_text': duplicate['corrected_text'],
+            'classification': duplicate['classification'],
+            'category': duplicate['category'],
+            'final_path': final_path,
+            'duplicate_of': duplicate['final_path']
+        }
+        self.index_document(image_hash, result, content_hash)
+        return result
+
+    def index_document(self, image_hash, result, content_hash=None):
+        if self.duplicates is None:
+            return
+        # The organized file: the source may have been moved there
+        final_path = result['final_path']
+        try:
+            if image_hash is None:
+                image_hash = self.duplicates.hash_image(final_path)
+            payload = {key: result[key] for key in
+                       ('original_text', 'corrected_text', 'classification', 'category', 'final_path')}
+            payload.update(sha256=content_hash or file_hash(final_path), fingerprint=self.dedup_fingerprint)
+            self.duplicates.add(final_path, image_hash, payload)
+        except Exception as e:
+            self.logger.warning(f"Could not add {final_path} to the duplicate index: {e}")
+
+    def lookup_ocr(self, image_path, content_hash=None):
+        content_hash = content_hash or file_hash(image_path)
+        return content_hash, self.result_cache.get('ocr', content_hash, self.stage_configs['ocr'])
+
+    def store_ocr(self, content_hash, ocr_result):
+        ocr_result = {'text': ocr_result['text'],
+                      'confidence': float(ocr_result['confidence']),
+                      'engine': ocr_result.get('engine')}
+        self.result_cache.put('ocr', content_hash, self.stage_configs['ocr'], ocr_result)
+
+    def correct_text(self, image_path, raw_text, ocr_confidence=0.0):
+        """Corrected text, and whether the correction was deferred
+
+        A deferred document is organized with its raw text; ``finish_document``
+        then queues the correction, which re-classifies the document when done.
+        """
+        content_hash = text_hash(raw_text)
+        cached = self.result_cache.get('correction', content_hash, self.stage_configs['correction'])
+        if cached is not None:
+            return cached['corrected_text'], False
+
+        # Clean, confident OCR skips the LLM; if keywords already settle the
+        # category, the correction only runs later in the background
+        category_decided = self.category_manager.match_keywords(raw_text) is not None
+        decision = self.correction_gate.decide(raw_text, ocr_confidence, category_decided)
+        if decision == 'skip':
+            return raw_text, False
+        if decision == 'defer':
+            return raw_text, True
+        corrected_text = self._run_correction(image_path, raw_text, content_hash)
+        return (raw_text if corrected_text is None else corrected_text), False
+
+    def _run_correction(self, image_path, raw_text, content_hash):
+        """LLM-corrected text, cached; None if the call failed"""
         vlm_result = self.vlm_client.process(image_path, context=raw_text)
-        corrected_text = vlm_result.get('corrected_text', raw_text)
         if 'error' in vlm_result:
             self.logger.warning(f"NLM processing error: {vlm_result['error']} - Falling back to OCR text")
+            return None
+        corrected_text = vlm_result.get('corrected_text', raw_text)
+        self.result_cache.put('correction', content_hash, self.stage_configs['correction'],
+                              {'corrected_text': corrected_text})
+        return corrected_text
 
-        # Step 4: Classification on corrected (or fallback) text
-        classification = self.text_classifier.classify(corrected_text)
+    def apply_deferred_correction(self, document, image_hash=None, content_hash=None):
+        """Correct a document organized with its raw OCR text, then re-classify, move and re-index it
 
-        # Step 5: Assign category based on classification
+        Raises if the correction failed, so the gate counts it as failed.
+        """
+        raw_text, old_path = document['original_text'], document['final_path']
+        # The organized file: the upload itself may have been moved there
+        corrected_text = self._run_correction(old_path, raw_text, text_hash(raw_text))
+        if corrected_text is None:
+            raise RuntimeError(f'LLM correction failed for {old_path}')
+
+        classification = self.classify_text(corrected_text)
         category_info = self.category_manager.assign_category(classification, corrected_text)
+        final_path = old_path
+        if category_info['category'] != document['category']['category']:
+            final_path = self.organize_document(old_path, category_info, move_source=True)
+            if self.duplicates is not None:
+                self.duplicates.remove(old_path)
+            self.logger.info(f"Corrected text re-classified {old_path} as {category_info['category']}: "
+                             f"moved to {final_path}")
+        self.index_document(image_hash, {**document, 'corrected_text': corrected_text,
+                                         'classification': classification, 'category': category_info,
+                                         'final_path': final_path}, content_hash)
+
+    def classify_text(self, text):
+        return self.classify_texts([text])[0]
+
+    def classify_texts(self, texts):
+        stage_config = self.stage_configs['classification']
+        hashes = [text_hash(text) for text in texts]
+        classifications = [self.result_cache.get('classification', h, stage_config) for h in hashes]
+        misses = [i for i, classification in enumerate(classifications) if classification is None]
+
+        # Cheap keyword/pattern pass first; only ambiguous texts reach the zero-shot model
+        for i in misses:
+            classifications[i] = self.category_manager.match_keywords(texts[i])
+        escalate = [i for i, classification in enumerate(classifications) if classification is None]
+        if escalate:
+            if len(escalate) == 1:
+                model_results = [self.text_classifier.classify(texts[escalate[0]])]
+            else:
+                model_results = self.text_classifier.classify_batch([texts[i] for i in escalate])
+            for i, classification in zip(escalate, model_results):
+                classification['decided_by'] = 'model'
+                classifications[i] = classification
+
+        for i in misses:
+            # A model result without scores is the fallback for a failed or unloaded model; don't cache it
+            if classifications[i].get('decided_by') == 'model' and not classifications[i].get('all_scores'):
+                continue
+            self.result_cache.put('classification', hashes[i], stage_config, classifications[i])
+        return classifications
+
+    def cache_stats(self):
+        return self.result_cache.stats()
+
+    def duplicate_stats(self):
+        return self.duplicates.stats() if self.duplicates is not None else {'enabled': False}
 
-        # Step 6: Organize document into proper folder
-        final_path = self.organize_document(image_path, category_info)
+    def correction_stats(self):
+        return self.correction_gate.stats()
 
-        return {
+    def llm_stats(self):
+        return self.vlm_client.stats()
+
+    def finish_document(self, image_path, raw_text, corrected_text, classification, image_hash=None,
+                        content_hash=None, move_source=False, defer_correction=False):
+        category_info = self.category_manager.assign_category(classification, corrected_text)
+        final_path = self.organize_document(image_path, category_info, move_source=move_source)
+
+        result = {
             'success': True,
             'original_text': raw_text,
             'corrected_text': corrected_text,
@@ -82,13 +301,46 @@ class AITextSorterPipeline:
             'category': category_info,
             'final_path': final_path
         }
+        self.index_document(image_hash, result, content_hash)
+        if defer_correction:
+            document = dict(result)
+            self.correction_gate.defer(lambda: self.apply_deferred_correction(document, image_hash, content_hash))
+            result['correction_deferred'] = True
+        return result
+
+    def process_batch(self, image_paths, results_path=None):
+        self.logger.info(f'Processing batch, streaming results to {results_path or "<none>"}')
+        engine = BatchEngine(self, self.config.get('batch', {}))
+        summary = engine.run(image_paths, results_path)
+        self.logger.info(f"Batch finished: {summary['documents']} documents at {summary['docs_per_second']} docs/sec")
+        return summary
+
+    def organize_document(self, src_path, category_info, link_to=None, move_source=False):
+        """Place the document in its category folder and return the new path
 
-    def organize_document(self, src_path, category_info):
+        The source is copied unless ``move_source`` is set (uploads), in which
+        case it is hard-linked into place and the source removed, so nothing
+        is copied.
+        """
         base_output = Path(self.config.get('storage', {}).get('output_folder', 'sorted_documents'))
         category_folder = base_output / category_info['category']
         category_folder.mkdir(parents=True, exist_ok=True)
 
         filename = Path(src_path).name
+
+        # An identical copy of an organized document is stored as another link to it
+        if link_to:
+            try:
+                dest = place_file(link_to, str(category_folder), filename, keep_source=True)
+                if move_source:
+                    os.remove(src_path)
+                return str(category_folder / dest)
+            except OSError as e:
+                self.logger.warning(f"Could not link {filename} to {link_to}, copying instead: {e}")
+
+        if move_source:
+            return str(category_folder / place_file(src_path, str(category_folder), filename))
+
         dest = category_folder / filename
         count = 1
         while dest.exists():
@@ -101,18 +353,27 @@ class AITextSorterPipeline:
         return str(dest)
 
 if __name__ == "__main__":
+    import json
     import argparse
     parser = argparse.ArgumentParser(description="AI Text Sorter with OCR + NLM")
-    parser.add_argument("--input", required=True, help="Input image path")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Input image path")
+    source.add_argument("--input-dir", help="Directory of images to process as a batch")
+    parser.add_argument("--results", default="batch_results.jsonl", help="JSONL file for per-document batch results")
     args = parser.parse_args()
 
     pipeline = AITextSorterPipeline()
-    result = pipeline.process_document(args.input)
 
-    if result["success"]:
-        print(f"Original OCR text:\n{result['original_text'][:300]}\n")
-        print(f"NLM corrected text:\n{result['corrected_text'][:300]}\n")
-        print(f"Category: {result['category']['category']}")
-        print(f"Saved to: {result['final_path']}")
+    if args.input_dir:
+        summary = pipeline.process_batch(iter_image_files(args.input_dir), args.results)
+        print(json.dumps(summary, indent=2))
     else:
-        print(f"Failed: {result.get('error', 'Unknown error')}")
+        result = pipeline.process_document(args.input)
+
+        if result["success"]:
+            print(f"Original OCR text:\n{result['original_text'][:300]}\n")
+            print(f"NLM corrected text:\n{result['corrected_text'][:300]}\n")
+            print(f"Category: {result['category']['category']}")
+            print(f"Saved to: {result['final_path']}")
+        else:
+            print(f"Failed: {result.get('error', 'Unknown error')}")
\ No newline at end of file
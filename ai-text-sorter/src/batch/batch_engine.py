@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from preprocessing.image_enhancer import ImageEnhancer
+from extraction.ocr_engine import MultiOCREngine
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
+
+STAGES = ('enhance', 'ocr', 'correct', 'classify', 'organize')
+
+# Per-process OCR state, created once by the pool initializer so every worker
+# loads its models a single time instead of once per document.
+_worker_enhancer = None
+_worker_ocr = None
+
+
+def _init_worker(preprocessing_config, ocr_config):
+    global _worker_enhancer, _worker_ocr
+    _worker_enhancer = ImageEnhancer(preprocessing_config)
+    _worker_ocr = MultiOCREngine(ocr_config)
+
+
+def _extract_worker(image_path):
+    start = time.perf_counter()
+    enhanced_image = _worker_enhancer.enhance(image_path)
+    enhanced_at = time.perf_counter()
+    ocr_result = _worker_ocr.extract_text(enhanced_image)
+    done = time.perf_counter()
+    return {
+        'text': ocr_result['text'],
+        'confidence': float(ocr_result['confidence']),
+        'engine': ocr_result.get('engine'),
+        'engine_latency': ocr_result.get('engine_latency', {}),
+        'timings': {'enhance': enhanced_at - start, 'ocr': done - enhanced_at}
+    }
+
+
+def iter_image_files(input_dir):
+    for path in sorted(Path(input_dir).rglob('*')):
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+            yield path
+
+
+class BatchEngine:
+    """Runs the pipeline stages over many documents at once.
+
+    Enhancement and OCR are CPU bound and run in a process pool, the
+    Perplexity correction is I/O bound and runs in a thread pool, and
+    corrected documents are buffered and classified in batches on the calling
+    thread before being organised. At most ``max_in_flight`` documents are admitted at a time, so a
+    slow stage holds back reading of new inputs instead of piling up work.
+    """
+
+    def __init__(self, pipeline, config):
+        self.logger = logging.getLogger(__name__)
+        self.pipeline = pipeline
+        self.cpu_workers = config.get('cpu_workers') or os.cpu_count() or 1
+        self.llm_workers = config.get('llm_workers', 8)
+        self.max_in_flight = config.get('max_in_flight') or 2 * self.cpu_workers + self.llm_workers
+        self.classify_batch_size = config.get('classify_batch_size', 16)
+
+    def run(self, image_paths, results_path=None):
+        paths = iter(image_paths)
+        pending = {}
+        ready = []
+        busy = dict.fromkeys(STAGES, 0.0)
+        counts = {'documents': 0, 'succeeded': 0, 'failed': 0, 'duplicates': 0}
+        decided_by = Counter()
+        config = self.pipeline.config
+
+        output = open(results_path, 'a', encoding='utf-8') if results_path else None
+        start = time.perf_counter()
+
+        def emit(result):
+            counts['documents'] += 1
+            counts['succeeded' if result.get('success') else 'failed'] += 1
+            counts['duplicates'] += 'duplicate_of' in result
+            if result.get('success'):
+                decided_by[result['category'].get('decided_by', 'unknown')] += 1
+            if output:
+                output.write(json.dumps(result, default=str) + '\n')
+                output.flush()
+
+        try:
+            with ProcessPoolExecutor(self.cpu_workers, initializer=_init_worker,
+                                     initargs=(config.get('preprocessing', {}), config.get('ocr', {}))) as cpu_pool, \
+                    ThreadPoolExecutor(self.llm_workers) as llm_pool:
+
+                # Each document carries its (perceptual, content) hashes through the stages, so
+                # indexing the organized file doesn't read and hash it again
+                def correct(path, hashes, ocr_result):
+                    if not ocr_result['text'].strip():
+                        emit({'success': False, 'input_path': path, 'error': 'No text extracted from OCR'})
+                        return
+                    pending[llm_pool.submit(self._correct, path, ocr_result)] = ('correct', path, hashes, ocr_result)
+
+                def admit():
+                    while len(pending) + len(ready) < self.max_in_flight:
+                        path = next(paths, None)
+                        if path is None:
+                            return
+                        path = str(path)
+                        try:
+                            # Near-duplicates of organized documents reuse their result right away
+                            image_hash, duplicate = self.pipeline.lookup_duplicate(path)
+                            if duplicate is not None:
+                                emit({**self.pipeline.finish_duplicate(path, image_hash, duplicate), 'input_path': path})
+                                continue
+                            content_hash, cached = self.pipeline.lookup_ocr(path)
+                        except OSError as e:
+                            emit({'success': False, 'input_path': path, 'error': str(e)})
+                            continue
+                        hashes = (image_hash, content_hash)
+                        if cached is not None:
+                            correct(path, hashes, cached)
+                        else:
+                            pending[cpu_pool.submit(_extract_worker, path)] = ('extract', path, hashes, None)
+
+                admit()
+                while pending or ready:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED) if pending else (set(), set())
+                    for future in done:
+                        stage, path, hashes, ocr_result = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            self.logger.error(f"Batch {stage} failed for {path}: {e}")
+                            emit({'success': False, 'input_path': path, 'error': str(e)})
+                            continue
+
+                        if stage == 'extract':
+                            for name, seconds in result['timings'].items():
+                                busy[name] += seconds
+                            self.pipeline.store_ocr(hashes[1], result)
+                            correct(path, hashes, result)
+                        else:
+                            (corrected_text, deferred), seconds = result
+                            busy['correct'] += seconds
+                            ready.append((path, hashes, ocr_result, deferred, corrected_text))
+
+                    if ready and (len(ready) >= self.classify_batch_size or not pending):
+                        for result in self._finish(ready, busy):
+                            emit(result)
+                        ready.clear()
+                    admit()
+        finally:
+            if output:
+                output.close()
+
+        elapsed = time.perf_counter() - start
+        return self._summary(counts, decided_by, busy, elapsed)
+
+    def _correct(self, image_path, ocr_result):
+        start = time.perf_counter()
+        correction = self.pipeline.correct_text(image_path, ocr_result['text'], ocr_result['confidence'])
+        return correction, time.perf_counter() - start
+
+    def _finish(self, ready, busy):
+        start = time.perf_counter()
+        classifications = self.pipeline.classify_texts([text for *_, text in ready])
+        busy['classify'] += time.perf_counter() - start
+
+        results = []
+        for (image_path, hashes, ocr_result, deferred, corrected_text), classification in zip(ready, classifications):
+            start = time.perf_counter()
+            try:
+                result = self.pipeline.finish_document(image_path, ocr_result['text'], corrected_text, classification,
+                                                       *hashes, defer_correction=deferred)
+            except Exception as e:
+                self.logger.error(f"Batch organize failed for {image_path}: {e}")
+                result = {'success': False, 'error': str(e)}
+            busy['organize'] += time.perf_counter() - start
+            result['input_path'] = image_path
+            result['ocr_confidence'] = ocr_result['confidence']
+            result['ocr_engine'] = ocr_result.get('engine')
+            result['ocr_engine_latency'] = ocr_result.get('engine_latency', {})
+            results.append(result)
+        return results
+
+    def _summary(self, counts, decided_by, busy, elapsed):
+        workers = {'enhance': self.cpu_workers, 'ocr': self.cpu_workers, 'correct': self.llm_workers,
+                   'classify': 1, 'organize': 1}
+        return {
+            **counts,
+            'decided_by': dict(decided_by),
+            'elapsed_seconds': round(elapsed, 3),
+            'docs_per_second': round(counts['documents'] / elapsed, 3) if elapsed else 0.0,
+            'stage_busy_seconds': {name: round(seconds, 3) for name, seconds in busy.items()},
+            'stage_utilization': {name: round(busy[name] / (elapsed * workers[name]), 3) if elapsed else 0.0
+                                  for name in STAGES}
+        }
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+# Bump to invalidate every stored result after a change in result format
+CACHE_VERSION = 1
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Persistent per-stage result cache keyed by content hash and stage config.
+
+    Each stage stores its own rows, so changing e.g. the classifier config
+    only misses for classification while cached OCR stays valid. Entries are
+    dropped once older than ``max_age_days`` and the least recently used ones
+    are evicted when the total payload exceeds ``max_size_mb``.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = config.get('enabled', True)
+        self.max_bytes = int(config.get('max_size_mb', 512) * 1024 * 1024)
+        self.max_age = config.get('max_age_days', 30) * 86400
+        self.evict_every = config.get('evict_every', 100)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.puts = 0
+        self.path = Path(config.get('path', 'cache/results.db'))
+        self.pid = None
+        self._conn = None
+        if not self.enabled:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                stage TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (stage, key)
+            )""")
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed_at)')
+        self.conn.commit()
+        self.evict()
+
+    @property
+    def conn(self):
+        # SQLite connections must not cross a fork, so each process opens its own
+        if self.pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self.pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def make_key(content_hash, stage_config):
+        fingerprint = json.dumps([CACHE_VERSION, stage_config], sort_keys=True, default=str)
+        return hashlib.sha256(f'{content_hash}:{fingerprint}'.encode('utf-8')).hexdigest()
+
+    def _count(self, stage, outcome):
+        counters = self.counters.setdefault(stage, {'hits': 0, 'misses': 0})
+        counters[outcome] += 1
+
+    def get(self, stage, content_hash, stage_config):
+        if not self.enabled:
+            return None
+        key = self.make_key(content_hash, stage_config)
+        with self.lock:
+            row = self.conn.execute('SELECT value, created_at FROM results WHERE stage = ? AND key = ?',
+                                    (stage, key)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.max_age:
+                self._count(stage, 'misses')
+                return None
+            self.conn.execute('UPDATE results SET accessed_at = ? WHERE stage = ? AND key = ?', (now, stage, key))
+            self.conn.commit()
+            self._count(stage, 'hits')
+        return json.loads(row[0])
+
+    def put(self, stage, content_hash, stage_config, value):
+        if not self.enabled:
+            return
+        payload = json.dumps(value, default=str)
+        key = self.make_key(content_hash, stage_config)
+        now = time.time()
+        with self.lock:
+            self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                              (stage, key, payload, len(payload), now, now))
+            self.conn.commit()
+            self.puts += 1
+            due = self.puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            expired = self.conn.execute('DELETE FROM results WHERE created_at < ?',
+                                        (time.time() - self.max_age,)).rowcount
+            oversize = self.conn.execute("""
+                DELETE FROM results WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, SUM(size) OVER (ORDER BY accessed_at DESC) AS running FROM results
+                    ) WHERE running > ?
+                )""", (self.max_bytes,)).rowcount
+            self.conn.commit()
+        if expired or oversize:
+            self.logger.info(f"Result cache evicted {expired} expired and {oversize} least recently used entries")
+
+    def stats(self):
+        if not self.enabled:
+            return {'enabled': False}
+        with self.lock:
+            entries, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+            stages = {stage: dict(counters) for stage, counters in self.counters.items()}
+        return {'enabled': True, 'entries': entries, 'bytes': size, 'stages': stages}
@@ -2,6 +2,8 @@ import os
 import json
 from pathlib import Path
 
+from classification.keyword_matcher import KeywordMatcher
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(BASE_DIR, '..', '..', 'config', 'categories.json')
 
@@ -11,9 +13,23 @@ class CategoryManager:
             self.categories_config = json.load(f)['categories']
         self.output_dir = Path('sorted_documents')
         self.output_dir.mkdir(exist_ok=True)
+        self.similarity_threshold = config.get('similarity_threshold', 0.8)
+        self.keyword_min_hits = config.get('keyword_min_hits', 2)
+        self.keyword_matcher = KeywordMatcher(self.categories_config)
+
+    def match_keywords(self, text):
+        """Return a keyword-based classification, or None when the model should decide."""
+        result = self.keyword_matcher.classify(text)
+        hits = result['keyword_hits'].get(result['primary_category'], 0)
+        if hits < self.keyword_min_hits or result['confidence'] < self.similarity_threshold:
+            return None
+        result['decided_by'] = 'keywords'
+        return result
 
     def assign_category(self, classification_result, text):
         cat = classification_result.get('primary_category', 'uncategorized')
         if cat not in self.categories_config:
             cat = 'uncategorized'
-        return {'category': cat, 'confidence': classification_result.get('confidence', 0)}
+        return {'category': cat,
+                'confidence': classification_result.get('confidence', 0),
+                'decided_by': classification_result.get('decided_by', 'model')}
@@ -0,0 +1,52 @@
+import re
+from collections import defaultdict
+
+
+class KeywordMatcher:
+    """Scores text against the keywords and patterns in categories.json.
+
+    Every keyword and pattern is compiled into one alternation regex with a
+    named group per (category, kind), so a document is scanned once
+    regardless of how many categories are configured.
+    """
+
+    KEYWORD_WEIGHT = 1.0
+    PATTERN_WEIGHT = 1.5
+
+    def __init__(self, categories_config):
+        self.groups = {}
+        alternatives = []
+        for index, (category, spec) in enumerate(categories_config.items()):
+            keywords = [re.escape(k) for k in spec.get('keywords', [])]
+            patterns = spec.get('patterns', [])
+            if keywords:
+                name = f'k{index}'
+                self.groups[name] = (category, self.KEYWORD_WEIGHT)
+                alternatives.append(rf"(?P<{name}>\b(?:{'|'.join(keywords)})(?:s|es)?\b)")
+            if patterns:
+                name = f'p{index}'
+                self.groups[name] = (category, self.PATTERN_WEIGHT)
+                alternatives.append(rf"(?P<{name}>\b(?:{'|'.join(patterns)})\b)")
+        self.regex = re.compile('|'.join(alternatives), re.IGNORECASE) if alternatives else None
+
+    def score(self, text):
+        scores = defaultdict(float)
+        hits = defaultdict(int)
+        if self.regex is not None:
+            for match in self.regex.finditer(text):
+                category, weight = self.groups[match.lastgroup]
+                scores[category] += weight
+                hits[category] += 1
+        return dict(scores), dict(hits)
+
+    def classify(self, text):
+        scores, hits = self.score(text)
+        total = sum(scores.values())
+        if not total:
+            return {'primary_category': 'uncategorized', 'confidence': 0.0, 'all_scores': {}, 'keyword_hits': {}}
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return {'primary_category': ranked[0][0],
+                'confidence': ranked[0][1] / total,
+                'all_scores': {category: score / total for category, score in ranked},
+                'keyword_hits': hits}
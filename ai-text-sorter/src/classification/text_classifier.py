@@ -1,8 +1,8 @@
 import os
 import json
+import time
 import logging
-from transformers import pipeline
-import torch
+import threading
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(BASE_DIR, '..', '..', 'config', 'categories.json')
@@ -12,23 +12,49 @@ class SmartTextClassifier:
         self.logger = logging.getLogger(__name__)
         self.model_name = config.get('model', 'distilbert-base-uncased')
         self.conf_threshold = config.get('confidence_threshold', 0.7)
-        try:
-            self.classifier = pipeline("zero-shot-classification",
-                                       model="facebook/bart-large-mnli",
-                                       device=0 if torch.cuda.is_available() else -1)
-            self.logger.info("Transformer zero-shot classifier ready")
-        except Exception as e:
-            self.logger.error(f"Failed to load classifier {e}")
-            self.classifier = None
+        self.zero_shot_model = config.get('zero_shot_model', 'facebook/bart-large-mnli')
+        self.max_length = config.get('max_length', 512)
+        self.batch_size = config.get('batch_size', 32)
+        self.hypothesis_template = config.get('hypothesis_template', 'This example is {}.')
+        self.load_seconds = {}
+        self.lock = threading.Lock()
+        self._classifier = None
+        self._loaded = False
         with open(CONFIG_PATH) as f:
             self.categories = list(json.load(f)['categories'].keys())
 
+    @property
+    def classifier(self):
+        # The zero-shot model is loaded on first use, so documents decided by
+        # keywords or served from cache never pay for it
+        if not self._loaded:
+            with self.lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    try:
+                        # Imported here so importing the pipeline doesn't pay for torch
+                        import torch
+                        from transformers import pipeline
+                        self._classifier = pipeline("zero-shot-classification",
+                                                    model=self.zero_shot_model,
+                                                    device=0 if torch.cuda.is_available() else -1)
+                        self.load_seconds['zero_shot'] = time.perf_counter() - start
+                        self.logger.info(f"Transformer zero-shot classifier ready in {self.load_seconds['zero_shot']:.2f}s")
+                    except Exception as e:
+                        self.logger.error(f"Failed to load classifier {e}")
+                        self._classifier = None
+                    self._loaded = True
+        return self._classifier
+
+    def warm_up(self):
+        return self.classifier is not None
+
     def classify(self, text, ocr_confidence=1.0):
         if not text.strip() or not self.classifier:
             return {'primary_category': 'uncategorized', 'confidence': 0.0, 'all_scores': {}}
 
         try:
-            result = self.classifier(text, self.categories)
+            result = self.classifier(text, self.categories, hypothesis_template=self.hypothesis_template)
             primary = result['labels'][0]
             confidence = result['scores'][0]
             return {'primary_category': primary,
@@ -37,3 +63,50 @@ class SmartTextClassifier:
         except Exception as e:
             self.logger.error(f"Classification error: {e}")
             return {'primary_category': 'uncategorized', 'confidence': 0.0, 'all_scores': {}}
+
+    def classify_batch(self, texts):
+        """Classify many texts, packing (text, hypothesis) pairs into padded batches.
+
+        Pairs are ordered by token length before being cut into batches of
+        ``batch_size`` so each batch pads to a similar length. Returns one
+        result dict per text, in the same format as ``classify``.
+        """
+        empty = {'primary_category': 'uncategorized', 'confidence': 0.0, 'all_scores': {}}
+        results = [dict(empty) for _ in texts]
+        todo = [i for i, text in enumerate(texts) if text.strip()]
+        if not todo or not self.classifier:
+            return results
+
+        try:
+            import torch
+            tokenizer = self.classifier.tokenizer
+            model = self.classifier.model
+            entailment_id = self.classifier.entailment_id
+            hypotheses = [self.hypothesis_template.format(c) for c in self.categories]
+
+            lengths = {i: len(tokenizer(texts[i], truncation=True, max_length=self.max_length)['input_ids'])
+                       for i in todo}
+            pairs = sorted(((i, j) for i in todo for j in range(len(hypotheses))),
+                           key=lambda pair: lengths[pair[0]])
+
+            logits = {i: [0.0] * len(hypotheses) for i in todo}
+            for start in range(0, len(pairs), self.batch_size):
+                chunk = pairs[start:start + self.batch_size]
+                inputs = tokenizer([texts[i] for i, _ in chunk], [hypotheses[j] for _, j in chunk],
+                                   padding='longest', truncation='only_first',
+                                   max_length=self.max_length, return_tensors='pt').to(self.classifier.device)
+                with torch.inference_mode():
+                    entail_logits = model(**inputs).logits[:, entailment_id].tolist()
+                for (i, j), value in zip(chunk, entail_logits):
+                    logits[i][j] = value
+
+            for i in todo:
+                scores = torch.softmax(torch.tensor(logits[i]), dim=0).tolist()
+                ranked = sorted(zip(self.categories, scores), key=lambda item: item[1], reverse=True)
+                results[i] = {'primary_category': ranked[0][0],
+                              'confidence': ranked[0][1],
+                              'all_scores': dict(ranked)}
+            return results
+        except Exception as e:
+            self.logger.error(f"Batch classification error: {e} - falling back to per-text classification")
+            return [self.classify(text) for text in texts]
@@ -2,6 +2,10 @@ import cv2
 import numpy as np
 import logging
 import os
+import time
+import threading
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     import pytesseract
@@ -9,6 +13,12 @@ try:
 except ImportError:
     TESSERACT = False
 
+try:
+    import tesserocr
+    TESSEROCR = True
+except ImportError:
+    TESSEROCR = False
+
 try:
     import easyocr
     EASYOCR = True
@@ -19,43 +29,218 @@ class MultiOCREngine:
     def __init__(self, config):
         self.logger = logging.getLogger(__name__)
         self.primary = config.get("primary_engine", "easyocr")
+        self.fallback = config.get("fallback_engine")
+        self.mode = config.get("mode", "single")
+        self.cascade_order = config.get("cascade_order", ["tesseract", "easyocr"])
+        self.cascade_threshold = config.get("cascade_threshold", 0.6)
+        self.min_word_confidence = config.get("min_word_confidence", 0.5)
         self.languages = config.get("languages", ["en"])
+        self.tesseract_lang = config.get("tesseract_lang", "eng")
+        self.tesseract_backend = config.get("tesseract_backend", "pytesseract")
+        if not {'pytesseract': TESSERACT, 'tesserocr': TESSEROCR}.get(self.tesseract_backend):
+            self.tesseract_backend = 'tesserocr' if TESSEROCR else 'pytesseract'
+        self.local = threading.local()
         self.engines = {}
+        self.load_seconds = {}
+        self.lock = threading.Lock()
+        self.pool = None
+        self.stats = {'documents': 0, 'escalations': 0, 'wins': {}, 'latency_seconds': {}}
 
-        if EASYOCR:
-            self.engines['easyocr'] = easyocr.Reader(self.languages)
-            self.logger.info("EasyOCR loaded")
-        if TESSERACT:
-            self.engines['tesseract'] = True
-            self.logger.info("Tesseract available")
+        # Only the configured engines are ever loaded; if none of them is
+        # installed, use whichever engine is available
+        available = {'easyocr': EASYOCR, 'tesseract': TESSERACT or TESSEROCR}
+        if self.mode in ('cascade', 'ensemble'):
+            configured = self.cascade_order
+        else:
+            configured = [self.primary] + ([self.fallback] if self.fallback else [])
+        self.enabled = [name for name in configured if available.get(name)]
+        if not self.enabled:
+            self.enabled = [name for name, installed in available.items() if installed]
 
-        if not self.engines:
+        if not self.enabled:
             raise RuntimeError("No OCR engine available")
+        if self.mode in ('cascade', 'ensemble') and len(self.enabled) < 2:
+            self.logger.warning(f"OCR {self.mode} mode needs two engines, running {self.enabled[0]} only")
+            self.mode = 'single'
+        # A single engine runs: the fallback only stands in when the primary isn't
+        # installed, so it must not be loaded (or warmed up) next to it
+        if self.mode not in ('cascade', 'ensemble'):
+            self.enabled = self.enabled[:1]
+
+    def _engine(self, name):
+        if name not in self.engines:
+            with self.lock:
+                if name not in self.engines:
+                    start = time.perf_counter()
+                    if name == 'easyocr':
+                        self.engines[name] = easyocr.Reader(self.languages)
+                    else:
+                        self.engines[name] = True
+                    self.load_seconds[name] = time.perf_counter() - start
+                    self.logger.info(f"{name} loaded in {self.load_seconds[name]:.2f}s")
+        return self.engines[name]
+
+    def warm_up(self):
+        for name in self.enabled:
+            self._engine(name)
 
     def extract_text(self, image):
-        if self.primary == 'easyocr' and 'easyocr' in self.engines:
-            return self._easyocr(image)
-        elif self.primary == 'tesseract' and 'tesseract' in self.engines:
-            return self._tesseract(image)
+        if self.mode == 'cascade':
+            result = self._cascade(image)
+        elif self.mode == 'ensemble':
+            result = self._ensemble(image)
         else:
-            if 'easyocr' in self.engines:
-                return self._easyocr(image)
-            elif 'tesseract' in self.engines:
-                return self._tesseract(image)
-            else:
-                return {'text': '', 'confidence': 0}
+            result = self._run(self.enabled[0], image)
+            result['engine_latency'] = {result['engine']: result.pop('latency')}
+        self._record(result)
+        return result
+
+    def _run(self, name, image):
+        start = time.perf_counter()
+        result = self._easyocr(image) if name == 'easyocr' else self._tesseract(image)
+        result['latency'] = time.perf_counter() - start
+        return result
+
+    def _cascade(self, image):
+        # Cheapest engine first; escalate only while confidence stays low
+        tried = []
+        for name in self.enabled:
+            tried.append(self._run(name, image))
+            if tried[-1]['confidence'] >= self.cascade_threshold:
+                break
+        result = max(tried, key=lambda r: r['confidence'])
+        result['engine_latency'] = {r['engine']: r.pop('latency') for r in tried}
+        result['escalated'] = len(tried) > 1
+        return result
+
+    def _ensemble(self, image):
+        if self.pool is None:
+            with self.lock:
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(len(self.enabled), thread_name_prefix='ocr-ensemble')
+        futures = [self.pool.submit(self._run, name, image) for name in self.enabled]
+        first, second = [future.result() for future in futures][:2]
+
+        words, picked = merge_words(first['words'], second['words'], self.min_word_confidence)
+        confidence = float(np.mean([conf for _, conf in words])) if words else 0
+        counts = {first['engine']: picked[0], second['engine']: picked[1]}
+        return {'text': ' '.join(word for word, _ in words),
+                'confidence': confidence,
+                'engine': max(counts, key=counts.get),
+                'words': words,
+                'words_by_engine': counts,
+                'engine_latency': {first['engine']: first['latency'], second['engine']: second['latency']}}
+
+    def _record(self, result):
+        with self.lock:
+            self.stats['documents'] += 1
+            self.stats['escalations'] += int(result.get('escalated', False))
+            self.stats['wins'][result['engine']] = self.stats['wins'].get(result['engine'], 0) + 1
+            for name, seconds in result['engine_latency'].items():
+                self.stats['latency_seconds'][name] = self.stats['latency_seconds'].get(name, 0.0) + seconds
+
+    def get_stats(self):
+        with self.lock:
+            return {'mode': self.mode, 'engines': list(self.enabled),
+                    'documents': self.stats['documents'], 'escalations': self.stats['escalations'],
+                    'wins': dict(self.stats['wins']),
+                    'latency_seconds': {name: round(s, 3) for name, s in self.stats['latency_seconds'].items()}}
 
     def _easyocr(self, image):
-        reader = self.engines['easyocr']
+        reader = self._engine('easyocr')
         results = reader.readtext(image)
         text = ' '.join([res[1] for res in results])
         confidence = np.mean([res[2] for res in results]) if results else 0
-        return {'text': text, 'confidence': confidence, 'engine': 'easyocr'}
+        # EasyOCR scores whole segments; every word inherits its segment's score
+        words = [(word, float(res[2])) for res in results for word in res[1].split()]
+        return {'text': text, 'confidence': confidence, 'engine': 'easyocr', 'words': words}
 
     def _tesseract(self, image):
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        text = pytesseract.image_to_string(rgb_image)
-        confs = pytesseract.image_to_data(rgb_image, output_type=pytesseract.Output.DICT)['conf']
-        confs = [int(c) for c in confs if c.isdigit() and int(c) > 0]
+        self._engine('tesseract')
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if self.tesseract_backend == 'tesserocr':
+            text, words = self._tesserocr_pass(image)
+        else:
+            text, words = self._pytesseract_pass(image)
+        confs = [c for _, c in words if c > 0]
         avg_conf = sum(confs)/len(confs)/100 if confs else 0.5
-        return {'text': text, 'confidence': avg_conf, 'engine': 'tesseract'}
+        return {'text': text, 'confidence': avg_conf, 'engine': 'tesseract',
+                'words': [(word, max(conf, 0) / 100) for word, conf in words]}
+
+    def _pytesseract_pass(self, image):
+        # A single recognition pass: the text is rebuilt from image_to_data's
+        # word boxes instead of recognizing the page again with image_to_string
+        data = pytesseract.image_to_data(image, lang=self.tesseract_lang, output_type=pytesseract.Output.DICT)
+        words = [(str(word), float(conf)) for word, conf in zip(data['text'], data['conf']) if str(word).strip()]
+        return words_to_text(data), words
+
+    def _tesserocr_api(self):
+        # PyTessBaseAPI handles aren't thread-safe, so each thread keeps its own
+        api = getattr(self.local, 'tesserocr_api', None)
+        if api is None:
+            start = time.perf_counter()
+            api = tesserocr.PyTessBaseAPI(lang=self.tesseract_lang)
+            self.local.tesserocr_api = api
+            self.load_seconds.setdefault('tesserocr', time.perf_counter() - start)
+        return api
+
+    def _tesserocr_pass(self, image):
+        api = self._tesserocr_api()
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+        return api.GetUTF8Text(), [(word, float(conf)) for word, conf in api.MapWordConfidences() if word.strip()]
+
+
+def words_to_text(data):
+    """Join image_to_data words into lines and paragraphs like image_to_string does."""
+    lines = []
+    current_line = current_par = None
+    for i, word in enumerate(data['text']):
+        if not str(word).strip():
+            continue
+        par = (data['block_num'][i], data['par_num'][i])
+        line = par + (data['line_num'][i],)
+        if line == current_line:
+            lines[-1] += ' ' + str(word)
+            continue
+        if current_par is not None and par != current_par:
+            lines.append('')
+        lines.append(str(word))
+        current_line, current_par = line, par
+    return '\n'.join(lines)
+
+
+def merge_words(first, second, min_confidence=0.5):
+    """Merge two engines' (word, confidence) lists by aligning the words.
+
+    Aligned words keep the more confident engine's reading. Spans that only
+    one engine saw, or that the engines split differently, keep whichever
+    side has the higher mean confidence, as long as it reaches
+    ``min_confidence``. Returns the merged words and how many came from each
+    engine.
+    """
+    def normalize(word):
+        return word.lower().strip('.,;:!?"\'()[]')
+
+    matcher = SequenceMatcher(None, [normalize(w) for w, _ in first], [normalize(w) for w, _ in second],
+                              autojunk=False)
+    merged, picked = [], [0, 0]
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        span_a, span_b = first[i1:i2], second[j1:j2]
+        if tag == 'equal' or (tag == 'replace' and len(span_a) == len(span_b)):
+            for word_a, word_b in zip(span_a, span_b):
+                index = 0 if word_a[1] >= word_b[1] else 1
+                merged.append((word_a, word_b)[index])
+                picked[index] += 1
+            continue
+
+        mean_a = np.mean([c for _, c in span_a]) if span_a else 0
+        mean_b = np.mean([c for _, c in span_b]) if span_b else 0
+        index = 0 if mean_a >= mean_b else 1
+        if max(mean_a, mean_b) >= min_confidence:
+            span = (span_a, span_b)[index]
+            merged.extend(span)
+            picked[index] += len(span)
+    return merged, picked
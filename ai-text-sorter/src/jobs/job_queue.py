@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+FINISHED = ('succeeded', 'failed')
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobStore:
+    """SQLite table of jobs, so queued work and results survive a restart."""
+
+    def __init__(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.pid = None
+        self._conn = None
+        self.lock = threading.Lock()
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                input_path TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )""")
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)')
+        self.conn.commit()
+
+    @property
+    def conn(self):
+        # SQLite connections must not cross a fork, so each process opens its own
+        if self.pid != os.getpid():
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self.pid = os.getpid()
+        return self._conn
+
+    def create(self, job_id, input_path, max_active=None):
+        """Insert a queued job; returns False instead if ``max_active`` jobs are already queued or running
+
+        Counting and inserting is one statement, so the limit holds across processes sharing the store.
+        """
+        with self.lock:
+            created = self.conn.execute(
+                "INSERT INTO jobs (id, status, input_path, created_at) SELECT ?, 'queued', ?, ? "
+                "WHERE ? IS NULL OR (SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')) < ?",
+                (job_id, input_path, time.time(), max_active, max_active)).rowcount
+            self.conn.commit()
+        return created == 1
+
+    def active(self):
+        """Number of jobs queued or running, in every process"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def claim(self, job_id):
+        # Conditional update, so only one worker (or worker process) runs a job
+        with self.lock:
+            claimed = self.conn.execute("UPDATE jobs SET status = 'running', started_at = ? "
+                                        "WHERE id = ? AND status = 'queued'", (time.time(), job_id)).rowcount
+            self.conn.commit()
+        return claimed == 1
+
+    def requeue_interrupted(self):
+        with self.lock:
+            count = self.conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL "
+                                      "WHERE status = 'running'").rowcount
+            self.conn.commit()
+        return count
+
+    def mark_finished(self, job_id, status, result=None, error=None):
+        with self.lock:
+            self.conn.execute('UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?',
+                              (status, json.dumps(result, default=str) if result is not None else None,
+                               error, time.time(), job_id))
+            self.conn.commit()
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def queued(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [row['id'] for row in rows]
+
+    def pending_inputs(self):
+        """Input paths of jobs that are queued or running"""
+        with self.lock:
+            rows = self.conn.execute("SELECT input_path FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        return {row['input_path'] for row in rows}
+
+
+class JobQueue:
+    """Bounded local work queue that runs jobs on a fixed set of worker threads.
+
+    ``handler`` is called with a job's input path and must return the
+    pipeline's result dict. Jobs left queued or running by a previous process
+    are re-queued on start-up; when several processes share the store, only
+    one of them should recover interrupted jobs and the rest pass
+    ``recover=False``.
+    """
+
+    def __init__(self, handler, config):
+        self.logger = logging.getLogger(__name__)
+        self.handler = handler
+        self.workers = config.get('workers', 2)
+        self.max_queue_depth = config.get('max_queue_depth', 100)
+        # Other processes' workers can't notify this one, so waiters re-read the store this often
+        self.poll_interval = config.get('poll_interval', 0.5)
+        self.store = JobStore(config.get('db_path', 'jobs/jobs.db'))
+        self.queue = queue.Queue()
+        self.changed = threading.Condition()
+        self.threads = []
+        self.stopping = threading.Event()
+
+    def start(self, recover=True):
+        with self.changed:
+            if self.threads:
+                return
+            if recover:
+                interrupted = self.store.requeue_interrupted()
+                if interrupted:
+                    self.logger.info(f"Re-queued {interrupted} interrupted jobs")
+            for job_id in self.store.queued():
+                self.queue.put(job_id)
+
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, input_path):
+        # Servers that import the app without calling start() still get workers
+        self.start(recover=False)
+        with self.changed:
+            job_id = uuid.uuid4().hex
+            if not self.store.create(job_id, input_path, self.max_queue_depth):
+                raise QueueFullError(f'Job queue is full ({self.max_queue_depth} jobs waiting or running)')
+            self.queue.put(job_id)
+        return job_id
+
+    def stop(self, timeout=None):
+        """Stop starting jobs and wait up to ``timeout`` seconds for running ones; returns True if all finished
+
+        Jobs still queued stay in the store and run after the next start.
+        """
+        self.stopping.set()
+        for _ in self.threads:
+            self.queue.put(None)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self.threads)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def depth(self):
+        # From the store, so every server process sees the same depth
+        return self.store.active()
+
+    def wait(self, job_id, last_status=None, timeout=30):
+        """Block until the job's status differs from ``last_status`` or ``timeout`` passes.
+
+        Workers in this process wake the waiter at once; changes made by other
+        processes sharing the store are seen within ``poll_interval``.
+        """
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                job = self.store.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job['status'] != last_status or remaining <= 0:
+                    return job
+                self.changed.wait(min(remaining, self.poll_interval))
+
+    def _notify(self):
+        with self.changed:
+            self.changed.notify_all()
+
+    def _work(self):
+        while True:
+            job_id = self.queue.get()
+            if job_id is None or self.stopping.is_set():
+                return
+            if not self.store.claim(job_id):
+                continue
+            job = self.store.get(job_id)
+            self._notify()
+            try:
+                result = self.handler(job['input_path'])
+                if result.get('success'):
+                    self.store.mark_finished(job_id, 'succeeded', result=result)
+                else:
+                    self.store.mark_finished(job_id, 'failed', error=result.get('error', 'Processing failed'))
+            except Exception as e:
+                self.logger.exception(f'Job {job_id} failed')
+                self.store.mark_finished(job_id, 'failed', error=str(e))
+            self._notify()
@@ -0,0 +1,122 @@
+import re
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+
+TOKEN_RE = re.compile(r"\S+")
+WORDLIKE_RE = re.compile(r"[a-z]+(?:'[a-z]+)?")
+REPEATED_RE = re.compile(r"(.)\1\1")
+NOISE_RE = re.compile(r"[^A-Za-z0-9\s.,;:!?'\"()\[\]/&%$#@+\-=*]")
+STRIP_CHARS = '.,;:!?"\'()[]'
+
+
+class CorrectionGate:
+    """Decides whether an OCR result is worth an LLM correction call.
+
+    ``decide`` returns one of:
+
+    - ``skip``: OCR confidence is high and the text looks clean.
+    - ``defer``: the category is already clear from the raw text, so the
+      document is organized right away and the correction, queued with
+      ``defer``, runs later on a low-priority background worker.
+    - ``correct``: call the LLM inline as before.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+        self.mode = config.get('mode', 'gated')
+        self.min_ocr_confidence = config.get('min_ocr_confidence', 0.85)
+        self.min_word_ratio = config.get('min_word_ratio', 0.85)
+        self.max_noise_ratio = config.get('max_noise_ratio', 0.05)
+        self.defer_when_decided = config.get('defer_when_decided', True)
+        self.dictionary = self._load_dictionary(config.get('dictionary_path'))
+        self.queue = queue.Queue(maxsize=config.get('background_queue_size', 1000))
+        self.lock = threading.Lock()
+        self.worker = None
+        self.counters = {'correct': 0, 'skip': 0, 'defer': 0, 'deferred_done': 0, 'deferred_failed': 0,
+                         'deferred_dropped': 0}
+
+    def _load_dictionary(self, path):
+        if not path or not Path(path).is_file():
+            return None
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            return {line.strip().lower() for line in f if line.strip()}
+
+    def _is_word(self, token):
+        if self.dictionary is not None:
+            return token in self.dictionary
+        if WORDLIKE_RE.fullmatch(token) is None or REPEATED_RE.search(token):
+            return False
+        if len(token) == 1:
+            return token in ('a', 'i')
+        return any(vowel in token for vowel in 'aeiouy')
+
+    def text_quality(self, text):
+        tokens = [t.strip(STRIP_CHARS).lower() for t in TOKEN_RE.findall(text)]
+        tokens = [t for t in tokens if t and not t.replace('.', '').replace(',', '').isdigit()]
+        word_ratio = sum(self._is_word(t) for t in tokens) / len(tokens) if tokens else 0.0
+        visible = len(text) - sum(c.isspace() for c in text)
+        noise_ratio = len(NOISE_RE.findall(text)) / visible if visible else 1.0
+        return {'word_ratio': word_ratio, 'noise_ratio': noise_ratio}
+
+    def decide(self, text, ocr_confidence, category_decided=False):
+        if self.mode == 'always':
+            decision = 'correct'
+        else:
+            quality = self.text_quality(text)
+            if (ocr_confidence >= self.min_ocr_confidence
+                    and quality['word_ratio'] >= self.min_word_ratio
+                    and quality['noise_ratio'] <= self.max_noise_ratio):
+                decision = 'skip'
+            elif category_decided and self.defer_when_decided:
+                decision = 'defer'
+            else:
+                decision = 'correct'
+        self._count(decision)
+        return decision
+
+    def defer(self, task):
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(task)
+        except queue.Full:
+            self._count('deferred_dropped')
+
+    def _ensure_worker(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._work, name='deferred-correction', daemon=True)
+                self.worker.start()
+
+    def drain(self, timeout):
+        """Wait up to ``timeout`` seconds for deferred corrections to finish; returns True if they did"""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+            try:
+                task()
+                self._count('deferred_done')
+            except Exception as e:
+                self.logger.error(f"Deferred correction failed: {e}")
+                self._count('deferred_failed')
+            finally:
+                self.queue.task_done()
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+        counters['deferred_pending'] = self.queue.qsize()
+        return {'mode': self.mode, **counters}
@@ -1,60 +1,57 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from llm_client import LLMClient
 import logging
 
 # Load .env file
 load_dotenv()
 
 class PerplexityVisionClient:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, model="sonar-medium-online", llm_config=None):
         self.logger = logging.getLogger(__name__)
+        self.model = model
         self.api_key = api_key or os.getenv('PERPLEXITY_API_KEY')
         if not self.api_key:
             raise ValueError("Perplexity API key not provided.")
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://api.perplexity.ai"
-        )
+
+        # Pooling, rate limiting, retries and metrics live in the shared client
+        llm_config = dict(llm_config or {})
+        provider = {'kind': 'openai', 'base_url': os.getenv('PERPLEXITY_BASE_URL', 'https://api.perplexity.ai'),
+                    **llm_config.get('providers', {}).get('perplexity', {}), 'api_key': self.api_key}
+        llm_config['providers'] = {**llm_config.get('providers', {}), 'perplexity': provider}
+        self.llm = LLMClient(llm_config)
 
     def process(self, image_path, context=""):
         try:
             prompt = f"""
             I have extracted text from a handwritten note using OCR, but it may contain errors.
             Please read and correct the following text, fixing any OCR mistakes and improving readability:
-            
+
             OCR Text: {context}
-            
+
             Please provide only the corrected, clean text without explanations.
             """
 
-            response = self.client.chat.completions.create(
-                model="sonar-medium-online",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": "You are an expert at reading and correcting handwritten text from OCR output."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
+            response = self.llm.generate(
+                'perplexity', self.model, prompt,
+                system="You are an expert at reading and correcting handwritten text from OCR output.",
                 max_tokens=1000,
                 temperature=0.1
             )
 
-            corrected_text = response.choices[0].message.content.strip()
+            corrected_text = response.text.strip()
             return {
-                'corrected_text': corrected_text, 
-                'response_raw': response
+                'corrected_text': corrected_text,
+                'usage': response.usage,
+                'latency': response.latency
             }
 
         except Exception as e:
             self.logger.error(f"Perplexity API call failed: {e}")
             return {
-                'corrected_text': context, 
-                'response_raw': None, 
+                'corrected_text': context,
                 'error': str(e)
             }
+
+    def stats(self):
+        return self.llm.stats()
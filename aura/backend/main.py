@@ -1,19 +1,54 @@
 import os
+import sys
 import json
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, UploadFile, File, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+# Repository root, for the llm_client package shared with the other backends
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from llm_client import LLMClient
+from response_cache import create_cache, content_hash, normalize_text
+
+logger = logging.getLogger(__name__)
+
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure the Gemini API
-try:
-    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-except Exception as e:
-    print(f"Error configuring Gemini API: {e}")
-    exit()
+# Configure the shared Gemini client (pooling, concurrency limits, rate limit, retries)
+llm = LLMClient({
+    'max_concurrency': int(os.getenv("LLM_MAX_CONCURRENCY", 16)),
+    'providers': {
+        'gemini': {
+            'kind': 'gemini',
+            'base_url': os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta"),
+            'api_key': os.getenv("GOOGLE_API_KEY"),
+            'max_concurrency': int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)),
+            'rate_per_second': float(os.getenv("GEMINI_RATE_PER_SECOND", 0)) or None,
+            'max_retries': int(os.getenv("GEMINI_MAX_RETRIES", 3)),
+            'hedge_after': float(os.getenv("GEMINI_HEDGE_AFTER", 0)) or None,
+        }
+    }
+})
+
+# Results keyed by image hash (whole response) and normalized-summary hash (suggestions)
+cache = create_cache(
+    backend=os.getenv("AURA_CACHE_BACKEND", "memory"),
+    path=os.getenv("AURA_CACHE_PATH", "aura_cache.db"),
+    max_entries=int(os.getenv("AURA_CACHE_MAX_ENTRIES", 1000)),
+    ttl=float(os.getenv("AURA_CACHE_TTL", 7 * 24 * 3600)),
+)
+
+# The client is blocking; its calls run on this bounded pool so the event loop stays free
+llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", 16)),
+                                  thread_name_prefix='gemini')
 
 
 app = FastAPI()
@@ -25,63 +60,130 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["Server-Timing", "X-Cache"],  # Lets the page read per-stage timings and cache status
 )
 
-# Initialize the generative models
-vision_model = genai.GenerativeModel('gemini-1.5-flash-latest')
-text_model = genai.GenerativeModel('gemini-1.5-flash-latest')
+# Models used for each step
+vision_model = os.getenv("GEMINI_VISION_MODEL", 'gemini-1.5-flash-latest')
+text_model = os.getenv("GEMINI_TEXT_MODEL", 'gemini-1.5-flash-latest')
 
-@app.post("/process-notes")
-async def process_notes(file: UploadFile = File(...)):
-    """
-    This endpoint receives an image of notes, extracts text,
-    corrects and autocompletes it, and suggests further reading.
+prompt_extract = "Extract all the handwritten text from this image. Output only the raw text."
+
+# Structured-output schemas for the JSON steps
+notes_schema = {
+    "type": "object",
+    "properties": {
+        "corrected_text": {"type": "string"},
+        "autocompleted_notes": {"type": "string"},
+    },
+    "required": ["corrected_text", "autocompleted_notes"],
+}
+suggestions_fallback = [{"title": "Error", "description": "Could not generate suggestions.", "url": ""}]
+suggestions_schema = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "description": {"type": "string"},
+            "url": {"type": "string"},
+        },
+        "required": ["title", "description", "url"],
+    },
+}
+
+async def generate(model, prompt, images=()):
+    """Run one Gemini call on the LLM pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(llm.generate, 'gemini', model, prompt, images=images)
+    return await loop.run_in_executor(llm_executor, call)
+
+
+async def generate_json(model, prompt, schema):
+    """Like ``generate``, but parse the reply as JSON (one repair call if needed) and return the value."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(llm.generate_json, 'gemini', model, prompt, schema=schema)
+    value, _ = await loop.run_in_executor(llm_executor, call)
+    return value
+
+
+async def stream_generate(model, prompt, on_chunk, cancelled):
+    """Stream one Gemini reply on the LLM pool, passing each chunk to ``on_chunk`` on the event loop.
+
+    Returns the full text. Setting ``cancelled`` stops reading the stream early.
     """
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="File provided is not an image.")
+    loop = asyncio.get_running_loop()
 
-    # 1. Read image content and extract text using Gemini Vision
-    image_contents = await file.read()
-    image_parts = [{"mime_type": file.content_type, "data": image_contents}]
-    
-    prompt_extract = "Extract all the handwritten text from this image. Output only the raw text."
-    
+    def run():
+        chunks = []
+        stream = llm.stream('gemini', model, prompt)
+        try:
+            for text in stream:
+                if cancelled.is_set():
+                    break
+                chunks.append(text)
+                loop.call_soon_threadsafe(on_chunk, text)
+        finally:
+            stream.close()
+        return ''.join(chunks)
+
+    return await loop.run_in_executor(llm_executor, run)
+
+
+async def timed(timings, stage, awaitable):
+    """Await a step and record its wall time under ``stage``."""
+    start = time.perf_counter()
     try:
-        response_vision = vision_model.generate_content([prompt_extract, *image_parts])
-        raw_text = response_vision.text
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error extracting text from image: {str(e)}")
+        return await awaitable
+    finally:
+        timings[stage] = time.perf_counter() - start
 
-    if not raw_text.strip():
-        raise HTTPException(status_code=400, detail="No text could be extracted from the image.")
 
-    # 2. Correct, autocomplete, and summarize the text using Gemini Pro
+def server_timing(timings):
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+async def correct_notes(raw_text):
     prompt_process = f"""
     You are an expert academic assistant. Based on the raw text extracted from a student's notes, perform the following tasks:
     1.  **Corrected Text**: Fix any spelling, grammar, or factual errors.
     2.  **Autocompleted Notes**: If sentences are incomplete or ideas are not fully explained, expand on them to create a more complete set of notes.
-    3.  **Summary**: Provide a concise summary of the key concepts.
 
-    Format your response as a single, clean JSON object with the keys "corrected_text", "autocompleted_notes", and "summary". Do not include any text outside of this JSON object.
+    Format your response as a single, clean JSON object with the keys "corrected_text" and "autocompleted_notes". Do not include any text outside of this JSON object.
 
     Raw Text:
     ---
     {raw_text}
     ---
     """
-    
+
     try:
-        response_process = text_model.generate_content(prompt_process)
-        processed_json_str = response_process.text.strip().replace("```json", "").replace("```", "").strip()
-        processed_data = json.loads(processed_json_str)
-    except (json.JSONDecodeError, Exception) as e:
+        return await generate_json(text_model, prompt_process, notes_schema)
+    except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing text or parsing JSON response: {str(e)}")
 
-    # 3. Suggest further reading based on the summary
-    summary = processed_data.get("summary", "")
-    if not summary:
-         raise HTTPException(status_code=400, detail="Could not generate a summary to find suggestions.")
 
+def summary_prompt(raw_text):
+    return f"""
+    You are an expert academic assistant. Provide a concise summary of the key concepts in the following raw text extracted from a student's notes.
+    Output only the summary.
+
+    Raw Text:
+    ---
+    {raw_text}
+    ---
+    """
+
+
+async def summarize_notes(raw_text):
+    try:
+        response_summary = await generate(text_model, summary_prompt(raw_text))
+        return response_summary.text.strip()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error summarizing text: {str(e)}")
+
+
+async def suggest_resources(summary):
     prompt_suggest = f"""
     Based on the following notes summary, recommend 3 to 5 external resources (articles, videos, interactive tutorials) to help a student master these concepts.
     Provide a title, a brief description, and a URL for each resource.
@@ -94,25 +196,228 @@ async def process_notes(file: UploadFile = File(...)):
     ---
     """
 
+    # Different photos of the same material tend to produce the same summary
+    summary_key = content_hash(text_model, normalize_text(summary))
+    try:
+        suggestions, _ = await cache.get_or_compute(
+            "suggestions", summary_key, lambda: generate_json(text_model, prompt_suggest, suggestions_schema))
+        return suggestions
+    except Exception as e:
+        logger.warning(f"Could not generate resource suggestions, using the fallback: {e}")
+        return suggestions_fallback
+
+
+async def summarize_and_suggest(raw_text, timings):
+    summary = await timed(timings, "summary", summarize_notes(raw_text))
+    if not summary:
+        raise HTTPException(status_code=400, detail="Could not generate a summary to find suggestions.")
+    suggestions = await timed(timings, "suggest", suggest_resources(summary))
+    return summary, suggestions
+
+
+@app.post("/process-notes")
+async def process_notes(response: Response, file: UploadFile = File(...)):
+    """
+    This endpoint receives an image of notes, extracts text,
+    corrects and autocompletes it, and suggests further reading.
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File provided is not an image.")
+
+    timings = {}
+    start = time.perf_counter()
+
+    # 1. Read image content; identical uploads share one cached or in-flight result
+    image_contents = await file.read()
+    image_key = content_hash(vision_model, text_model, image_contents)
+
+    final_response, cache_status = await cache.get_or_compute(
+        "notes", image_key,
+        lambda: compute_notes(file.content_type, image_contents, timings),
+        should_store=lambda result: result["suggestions"] != suggestions_fallback,
+    )
+
+    timings["total"] = time.perf_counter() - start
+    response.headers["Server-Timing"] = server_timing(timings)
+    response.headers["X-Cache"] = cache_status
+    return final_response
+
+
+async def compute_notes(content_type, image_contents, timings):
+    # 2. Extract text using Gemini Vision
+    image_parts = [(content_type, image_contents)]
+
     try:
-        response_suggest = text_model.generate_content(prompt_suggest)
-        suggest_json_str = response_suggest.text.strip().replace("```json", "").replace("```", "").strip()
-        suggestions = json.loads(suggest_json_str)
-    except (json.JSONDecodeError, Exception) as e:
-        suggestions = [{"title": "Error", "description": "Could not generate suggestions.", "url": ""}]
-
-    # 4. Combine all results and return
-    final_response = {
+        response_vision = await timed(timings, "extract", generate(vision_model, prompt_extract, images=image_parts))
+        raw_text = response_vision.text
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error extracting text from image: {str(e)}")
+
+    if not raw_text.strip():
+        raise HTTPException(status_code=400, detail="No text could be extracted from the image.")
+
+    # 3. Correct/autocomplete the text while the summary and the suggestions
+    #    built from it are produced alongside; both only need the raw text
+    processed_data, (summary, suggestions) = await asyncio.gather(
+        timed(timings, "correct", correct_notes(raw_text)),
+        summarize_and_suggest(raw_text, timings),
+    )
+
+    # 4. Combine all results
+    return {
         "raw_text": raw_text,
         "corrected_text": processed_data.get("corrected_text", ""),
         "autocompleted_notes": processed_data.get("autocompleted_notes", ""),
         "summary": summary,
         "suggestions": suggestions
     }
-    
-    return final_response
+
+
+def stream_prompts(raw_text):
+    """Plain-text prompts for the streamed fields, so tokens can be shown as they arrive."""
+    return {
+        "corrected_text": f"""
+    You are an expert academic assistant. Fix any spelling, grammar, or factual errors in the following raw text extracted from a student's notes.
+    Output only the corrected text.
+
+    Raw Text:
+    ---
+    {raw_text}
+    ---
+    """,
+        "autocompleted_notes": f"""
+    You are an expert academic assistant. Where sentences in the following raw text extracted from a student's notes are incomplete or ideas are not fully explained, expand on them to create a more complete set of notes.
+    Output only the completed notes.
+
+    Raw Text:
+    ---
+    {raw_text}
+    ---
+    """,
+        "summary": summary_prompt(raw_text),
+    }
+
+
+def ndjson(event):
+    return json.dumps(event) + "\n"
+
+
+@app.post("/process-notes/stream")
+async def process_notes_stream(file: UploadFile = File(...)):
+    """
+    Streaming variant of /process-notes. Responds with newline-delimited JSON
+    events: "raw_text" as soon as extraction finishes, "delta" chunks and a
+    final "done" per field (corrected_text, autocompleted_notes, summary),
+    "suggestions" last, then "end" with per-stage timings. Failures arrive as
+    "error" events, tagged with the field when only that field failed.
+
+    A cached result for the same image is replayed as "done" events at once;
+    a fully successful live run is stored for /process-notes and later streams.
+    """
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File provided is not an image.")
+
+    image_contents = await file.read()
+    image_parts = [(file.content_type, image_contents)]
+    image_key = content_hash(vision_model, text_model, image_contents)
+
+    async def events():
+        timings = {}
+        start = time.perf_counter()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+        tasks = []
+
+        async def stream_field(field, prompt):
+            def on_chunk(text):
+                queue.put_nowait({"event": "delta", "field": field, "text": text})
+            try:
+                text = await timed(timings, field, stream_generate(text_model, prompt, on_chunk, cancelled))
+            except Exception as e:
+                queue.put_nowait({"event": "error", "field": field, "detail": str(e)})
+                return ""
+            queue.put_nowait({"event": "done", "field": field, "text": text})
+            return text
+
+        async def summary_then_suggestions(prompt):
+            # Suggestions only need the summary, so they start while the other fields still stream
+            summary = await stream_field("summary", prompt)
+            if summary.strip():
+                suggestions = await timed(timings, "suggest", suggest_resources(summary))
+            else:
+                suggestions = suggestions_fallback
+            return summary, suggestions
+
+        def end_event(cache_status):
+            timings["total"] = time.perf_counter() - start
+            return ndjson({"event": "end", "cache": cache_status,
+                           "timings": {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}})
+
+        def finished(streams):
+            if not streams.cancelled():
+                streams.exception()  # Retrieved, so a client disconnect isn't logged as an error
+            queue.put_nowait(None)
+
+        try:
+            cached = await cache.get("notes", image_key)
+            if cached is not None:
+                yield ndjson({"event": "raw_text", "text": cached["raw_text"]})
+                for field in ("corrected_text", "autocompleted_notes", "summary"):
+                    yield ndjson({"event": "done", "field": field, "text": cached[field]})
+                yield ndjson({"event": "suggestions", "suggestions": cached["suggestions"]})
+                yield end_event("hit")
+                return
+
+            try:
+                response_vision = await timed(timings, "extract", generate(vision_model, prompt_extract, images=image_parts))
+                raw_text = response_vision.text
+            except Exception as e:
+                yield ndjson({"event": "error", "detail": f"Error extracting text from image: {str(e)}"})
+                return
+
+            if not raw_text.strip():
+                yield ndjson({"event": "error", "detail": "No text could be extracted from the image."})
+                return
+            yield ndjson({"event": "raw_text", "text": raw_text})
+
+            prompts = stream_prompts(raw_text)
+            tasks = [asyncio.create_task(stream_field("corrected_text", prompts["corrected_text"])),
+                     asyncio.create_task(stream_field("autocompleted_notes", prompts["autocompleted_notes"])),
+                     asyncio.create_task(summary_then_suggestions(prompts["summary"]))]
+            asyncio.gather(*tasks).add_done_callback(finished)
+
+            while (event := await queue.get()) is not None:
+                yield ndjson(event)
+
+            corrected_text, autocompleted_notes = tasks[0].result(), tasks[1].result()
+            summary, suggestions = tasks[2].result()
+            yield ndjson({"event": "suggestions", "suggestions": suggestions})
+
+            # Failed fields come back empty; only complete results are worth keeping
+            if corrected_text and autocompleted_notes and summary and suggestions != suggestions_fallback:
+                await cache.put("notes", image_key, {
+                    "raw_text": raw_text,
+                    "corrected_text": corrected_text,
+                    "autocompleted_notes": autocompleted_notes,
+                    "summary": summary,
+                    "suggestions": suggestions
+                })
+            yield end_event("miss")
+        finally:
+            # The client may have gone away mid-stream; stop reading from Gemini
+            cancelled.set()
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.get("/")
 def read_root():
-    return {"status": "Notes AI Backend is running!"}
\ No newline at end of file
+    return {"status": "Notes AI Backend is running!"}
+
+
+@app.get("/stats")
+def read_stats():
+    return {"llm": llm.stats(), "cache": cache.stats()}
\ No newline at end of file
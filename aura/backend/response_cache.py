@@ -0,0 +1,176 @@
+import re
+import json
+import time
+import asyncio
+import hashlib
+import functools
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive form of a text, so near-identical summaries share a key."""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class MemoryBackend:
+    """Per-process LRU dict with per-entry expiry."""
+
+    # Cheap and not thread-safe: called on the event loop itself
+    blocking = False
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, ttl):
+        self.entries[key] = (time.time() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self.entries), 'evictions': self.evictions}
+
+
+class SQLiteBackend:
+    """SQLite-backed cache, shared by every worker on the host and kept across restarts."""
+
+    # Disk I/O (and waits on other processes' writes): run in an executor, off the event loop
+    blocking = True
+
+    def __init__(self, path, max_entries=10000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        # Used from executor threads and the stats endpoint's thread
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+
+    def _get(self, key):
+        now = time.time()
+        row = self.conn.execute('SELECT value, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+            return None
+        self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value, ttl):
+        with self.lock:
+            self._put(key, value, ttl)
+
+    def _put(self, key, value, ttl):
+        now = time.time()
+        self.conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                          (key, json.dumps(value), now + ttl, now))
+        self.conn.execute('DELETE FROM responses WHERE expires_at < ?', (now,))
+        excess = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.conn.execute('''DELETE FROM responses WHERE key IN
+                (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)''', (excess,))
+            self.evictions += excess
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'backend': 'sqlite', 'entries': entries, 'evictions': self.evictions}
+
+
+class ResponseCache:
+    """TTL/LRU cache for LLM results with in-flight request coalescing.
+
+    ``get_or_compute`` returns a cached value, or joins a computation that is
+    already running for the same key, or starts one, together with where the
+    value came from (``hit``, ``coalesced`` or ``miss``). The computation runs
+    as its own task, so a client disconnecting doesn't cancel it for the
+    other requests waiting on it. Failures, and results ``should_store``
+    rejects, are not cached.
+    """
+
+    def __init__(self, backend, ttl=7 * 24 * 3600):
+        self.backend = backend
+        self.ttl = ttl
+        self.in_flight = {}
+        self.counters = {'hits': 0, 'misses': 0, 'coalesced': 0, 'stores': 0}
+
+    async def _call(self, method, *args):
+        if not self.backend.blocking:
+            return method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(method, *args))
+
+    async def get(self, namespace, key):
+        value = await self._call(self.backend.get, f'{namespace}:{key}')
+        self.counters['hits' if value is not None else 'misses'] += 1
+        return value
+
+    async def put(self, namespace, key, value):
+        await self._call(self.backend.put, f'{namespace}:{key}', value, self.ttl)
+        self.counters['stores'] += 1
+
+    async def get_or_compute(self, namespace, key, compute, should_store=None):
+        full_key = f'{namespace}:{key}'
+        task = self.in_flight.get(full_key)
+        if task is not None:
+            self.counters['coalesced'] += 1
+            value, _ = await asyncio.shield(task)
+            return value, 'coalesced'
+
+        # The lookup runs inside the task too: with a blocking backend it yields to
+        # the event loop, and requests arriving meanwhile must join, not start another
+        async def run():
+            try:
+                value = await self.get(namespace, key)
+                if value is not None:
+                    return value, 'hit'
+                value = await compute()
+                if should_store is None or should_store(value):
+                    await self.put(namespace, key, value)
+                return value, 'miss'
+            finally:
+                del self.in_flight[full_key]
+
+        task = self.in_flight[full_key] = asyncio.create_task(run())
+        return await asyncio.shield(task)
+
+    def stats(self):
+        lookups = self.counters['hits'] + self.counters['misses']
+        return {**self.counters, **self.backend.stats(), 'in_flight': len(self.in_flight), 'ttl_seconds': self.ttl,
+                'hit_rate': round(self.counters['hits'] / lookups, 4) if lookups else None}
+
+
+def create_cache(backend='memory', path='aura_cache.db', max_entries=1000, ttl=7 * 24 * 3600):
+    if backend == 'sqlite':
+        return ResponseCache(SQLiteBackend(path, max_entries), ttl)
+    return ResponseCache(MemoryBackend(max_entries), ttl)
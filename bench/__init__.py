@@ -0,0 +1,11 @@
+"""Benchmarks and offline load tests for the three backends.
+
+* ``bench.corpus``: synthetic handwritten-note images with ground truth
+* ``bench.load``: end-to-end load test of /api/process, /upload or
+  /process-notes against the fake LLM provider from llm_client
+* ``bench.compare``: diff two reports and flag regressions
+
+Per-stage micro-benchmarks of the ai-text-sorter pipeline live next to the
+other pipeline benchmarks, in ai-text-sorter/benchmarks/bench_stages.py.
+All of them write the JSON report described in ``bench.stats``.
+"""
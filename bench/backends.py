@@ -0,0 +1,157 @@
+"""Run a backend as a subprocess against the fake LLM provider, with all its state in a scratch directory.
+
+Every path a backend writes to (uploads, organized files, caches, job and
+index databases, custom directories) is pointed into the scratch directory,
+and every LLM base URL and API key at the fake provider, so a load test
+never touches the checkout's data or a real API.
+"""
+import os
+import sys
+import time
+import signal
+import subprocess
+
+import httpx
+import yaml
+
+from .stats import REPO_ROOT
+
+
+def _ai_text_sorter_env(workdir, llm_url, cache):
+    # The API reads everything from config.yaml, so write a copy with scratch paths
+    base_dir = os.path.join(REPO_ROOT, 'ai-text-sorter')
+    with open(os.path.join(base_dir, 'config', 'config.yaml')) as f:
+        config = yaml.safe_load(f)
+    config['storage'] = {**config.get('storage', {}), 'upload_folder': os.path.join(workdir, 'uploads'),
+                         'output_folder': os.path.join(workdir, 'sorted_documents'),
+                         'log_folder': os.path.join(workdir, 'logs')}
+    config['cache'] = {**config.get('cache', {}), 'path': os.path.join(workdir, 'cache', 'results.db'),
+                       'enabled': cache}
+    config['dedup'] = {**config.get('dedup', {}), 'path': os.path.join(workdir, 'cache', 'duplicates.db'),
+                       'enabled': cache}
+    config['jobs'] = {**config.get('jobs', {}), 'db_path': os.path.join(workdir, 'jobs', 'jobs.db')}
+    config_path = os.path.join(workdir, 'config.yaml')
+    with open(config_path, 'w') as f:
+        yaml.safe_dump(config, f)
+    return {'AI_TEXT_SORTER_CONFIG': config_path, 'PERPLEXITY_BASE_URL': llm_url, 'PERPLEXITY_API_KEY': 'fake'}
+
+
+def _image_organizer_env(workdir, llm_url, cache):
+    uploads = os.path.join(workdir, 'uploads')
+    return {'UPLOAD_FOLDER': uploads, 'ORGANIZED_FOLDER': os.path.join(uploads, 'organized'),
+            'CUSTOM_DIRS_FILE': os.path.join(workdir, 'custom_directories.json'),
+            'CATALOG_DB': os.path.join(uploads, 'catalog.db'), 'DEDUP_DB': os.path.join(uploads, 'duplicates.db'),
+            'EMBEDDING_DB': os.path.join(uploads, 'embeddings.db'),
+            'THUMBNAIL_FOLDER': os.path.join(uploads, 'thumbnails'),
+            'DEDUP_ENABLED': 'true' if cache else 'false',
+            'GEMINI_BASE_URL': llm_url, 'GEMINI_API_KEY': 'fake'}
+
+
+def _image_organizer_setup(client):
+    # With no custom directories nothing reaches Gemini, so create some
+    for name in ('academic', 'business', 'personal', 'legal', 'medical'):
+        client.post('/custom-directories', json={'name': name, 'description': f'{name} notes and documents'})
+
+
+def _aura_env(workdir, llm_url, cache):
+    return {'GEMINI_BASE_URL': llm_url, 'GOOGLE_API_KEY': 'fake', 'AURA_CACHE_BACKEND': 'memory',
+            'AURA_CACHE_TTL': '604800' if cache else '0'}
+
+
+TARGETS = {
+    'ai-text-sorter': {
+        'cwd': 'ai-text-sorter',
+        'command': lambda port, workers: ['serve.py', '--host', '127.0.0.1', '--port', str(port),
+                                          '--workers', str(workers)],
+        'env': _ai_text_sorter_env,
+        'health': '/api/health',
+        'endpoint': '/api/process',
+    },
+    'image-organizer': {
+        'cwd': 'image-organizer/backend',
+        'command': lambda port, workers: ['serve.py', '--host', '127.0.0.1', '--port', str(port),
+                                          '--workers', str(workers)],
+        'env': _image_organizer_env,
+        'setup': _image_organizer_setup,
+        'health': '/health',
+        'endpoint': '/upload',
+    },
+    'aura': {
+        'cwd': 'aura/backend',
+        'command': lambda port, workers: ['-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+                                          '--workers', str(workers), '--log-level', 'warning'],
+        'env': _aura_env,
+        'health': '/',
+        'endpoint': '/process-notes',
+    },
+}
+
+
+class BackendProcess:
+    """Context manager that starts a backend, waits until it answers its health check and stops it gracefully"""
+
+    def __init__(self, name, port, workers, llm_url, workdir, cache=True, startup_timeout=180):
+        self.target = TARGETS[name]
+        self.name = name
+        self.port = port
+        self.workers = workers
+        self.llm_url = llm_url
+        self.workdir = workdir
+        self.cache = cache
+        self.startup_timeout = startup_timeout
+        self.log_path = os.path.join(workdir, 'server.log')
+        self.process = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def __enter__(self):
+        env = {**os.environ, **self.target['env'](self.workdir, self.llm_url, self.cache)}
+        with open(self.log_path, 'ab') as log:
+            self.process = subprocess.Popen([sys.executable] + self.target['command'](self.port, self.workers),
+                                            cwd=os.path.join(REPO_ROOT, self.target['cwd']), env=env,
+                                            stdout=log, stderr=subprocess.STDOUT)
+        try:
+            self._wait_until_ready()
+            with httpx.Client(base_url=self.base_url, timeout=30) as client:
+                if 'setup' in self.target:
+                    self.target['setup'](client)
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def _wait_until_ready(self):
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.name} exited with {self.process.returncode}:\n{self.log_tail()}')
+            try:
+                if httpx.get(self.base_url + self.target['health'], timeout=5).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f'{self.name} did not become ready in {self.startup_timeout}s:\n{self.log_tail()}')
+
+    def log_tail(self, lines=30):
+        try:
+            with open(self.log_path, errors='replace') as f:
+                return ''.join(f.readlines()[-lines:])
+        except FileNotFoundError:
+            return ''
+
+    def stop(self, timeout=30):
+        if self.process is None or self.process.poll() is not None:
+            return
+        # SIGTERM lets gunicorn/uvicorn drain in-flight work first
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def __exit__(self, *exc_info):
+        self.stop()
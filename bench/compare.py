@@ -0,0 +1,72 @@
+"""Compare two benchmark reports and flag regressions.
+
+    python -m bench.compare before.json after.json [--threshold 0.10]
+
+Results are matched by name. Higher p50/p95/p99 latency or lower throughput
+than ``threshold`` (relative), or an error rate more than
+``error_threshold`` (absolute) higher, counts as a regression, and the exit
+status is 1 if there is any, so this can gate CI.
+"""
+import sys
+import json
+import argparse
+
+# (metric, getter, True if larger is better)
+METRICS = [
+    ('p50 ms', lambda result: result['latency_ms']['p50'], False),
+    ('p95 ms', lambda result: result['latency_ms']['p95'], False),
+    ('p99 ms', lambda result: result['latency_ms']['p99'], False),
+    ('per sec', lambda result: result['throughput_per_second'], True),
+    ('error rate', lambda result: result['error_rate'], False),
+]
+
+
+def compare(baseline, current, threshold=0.10, error_threshold=0.01):
+    """``[(name, metric, before, after, relative change, regressed)]`` for results in both reports"""
+    rows = []
+    for name, after in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or 'skipped' in before or 'skipped' in after:
+            continue
+        for metric, get, larger_is_better in METRICS:
+            old, new = get(before), get(after)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+            if metric == 'error rate':
+                # Absolute: going from 0 to 1% errors is a regression, not "infinitely worse"
+                regressed = new - old > error_threshold
+            else:
+                regressed = (-change if larger_is_better else change) > threshold
+            rows.append((name, metric, old, new, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark JSON reports')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change that counts as a regression')
+    parser.add_argument('--error-threshold', type=float, default=0.01,
+                        help='Absolute error rate increase that counts as a regression')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.error_threshold)
+    if not rows:
+        print('No results in common')
+        return
+    print(f"{'benchmark':<44} {'metric':<10} {'before':>10} {'after':>10} {'change':>8}")
+    for name, metric, old, new, change, regressed in rows:
+        print(f"{name:<44} {metric:<10} {old:>10.2f} {new:>10.2f} {change:>+7.1%} {'REGRESSION' if regressed else ''}")
+    regressions = sum(row[-1] for row in rows)
+    print(f'{regressions} regression(s) beyond {args.threshold:.0%}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Synthetic handwritten-note corpus for the benchmarks.
+
+    python -m bench.corpus --out corpus --count 40 [--seed 0] [--font handwriting.ttf]
+
+Each note is a phone-photo-like JPEG of a few lines of text on ruled paper:
+words wobble off the baseline and tilt, ink colour and pressure vary, and
+the page is slightly rotated, blurred and noisy. The text comes from
+per-category phrase lists (the categories in ai-text-sorter's
+categories.json), and is written next to the image as ``<name>.txt``,
+which benchmarks/bench_preprocessing.py already reads as ground truth.
+Output is deterministic for a given seed.
+"""
+import os
+import random
+import argparse
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+PHRASES = {
+    'academic': ['lecture notes on photosynthesis and the calvin cycle', 'homework due before the midterm exam',
+                 'chapter summary for the literature review', 'thesis outline and research questions',
+                 'professor office hours on thursday', 'derive the equation for the next assignment'],
+    'business': ['quarterly revenue forecast for the team meeting', 'invoice number and payment terms',
+                 'action items from the client call', 'marketing budget and sales targets',
+                 'follow up with the vendor about the contract', 'agenda for the project kickoff'],
+    'personal': ['grocery list milk eggs bread and apples', 'call mom about the weekend trip',
+                 'birthday gift ideas for my sister', 'remember to water the plants', 'pick up the dry cleaning',
+                 'plan the family dinner on sunday'],
+    'legal': ['the agreement terminates upon written notice', 'clause seven covers liability and indemnity',
+              'signed by both parties before the witness', 'court hearing scheduled next month',
+              'the tenant shall pay rent on the first', 'attorney review of the settlement terms'],
+    'medical': ['take the prescription twice daily after meals', 'blood pressure and heart rate recorded',
+                'doctor appointment for the follow up visit', 'patient reports mild fever and headache',
+                'dosage of the antibiotic for seven days', 'symptoms improved after the treatment'],
+}
+INKS = [(20, 30, 90), (15, 15, 20), (40, 40, 60), (10, 40, 120)]
+
+
+def load_font(size, font_path=None):
+    if font_path:
+        return ImageFont.truetype(font_path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1: fixed-size bitmap font only
+        return ImageFont.load_default()
+
+
+def note_text(rng, category, lines):
+    return '\n'.join(rng.choice(PHRASES[category]) for _ in range(lines))
+
+
+def render_note(text, rng, font, size=(1240, 1754)):
+    """The note as a grayscale-ish RGB photo of ruled paper"""
+    width, height = size
+    paper = np.full((height, width, 3), (246, 243, 232), dtype=np.float32)
+    paper += np.random.default_rng(rng.getrandbits(32)).normal(0, 4, paper.shape)
+    page = Image.fromarray(np.clip(paper, 0, 255).astype(np.uint8))
+    draw = ImageDraw.Draw(page)
+
+    font_size = getattr(font, 'size', 11)  # Pillow's old bitmap font has no size
+    line_height = int(font_size * 1.9)
+    top = int(height * 0.08)
+    for y in range(top, height - line_height, line_height):
+        draw.line([(0, y), (width, y)], fill=(170, 190, 220), width=2)
+
+    ink = rng.choice(INKS)
+    y = top - int(line_height * 0.15)
+    for line in text.split('\n'):
+        x = int(width * 0.07) + rng.randint(-10, 10)
+        for word in line.split():
+            left, _, right, bottom = font.getbbox(word)
+            layer = Image.new('RGBA', (right - left + 20, bottom + 20), (0, 0, 0, 0))
+            pressure = rng.randint(190, 255)
+            ImageDraw.Draw(layer).text((10 - left, 10), word, font=font, fill=(*ink, pressure))
+            layer = layer.rotate(rng.uniform(-4, 4), resample=Image.BICUBIC, expand=True)
+            if x + layer.width > width * 0.95:
+                x = int(width * 0.07) + rng.randint(-10, 10)
+                y += line_height
+            page.paste(layer, (x, y - layer.height + line_height // 2 + rng.randint(-4, 4) + 10), layer)
+            x += layer.width + rng.randint(int(font_size * 0.2), int(font_size * 0.6)) - 20
+        y += line_height
+
+    page = page.rotate(rng.uniform(-1.5, 1.5), resample=Image.BICUBIC, fillcolor=(90, 90, 90))
+    return page.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 0.9)))
+
+
+def generate_corpus(out_dir, count=20, seed=0, font_path=None, lines=(4, 9)):
+    """Write ``count`` notes and their ground truth into ``out_dir``; returns the image paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    categories = sorted(PHRASES)
+    paths = []
+    for index in range(count):
+        category = categories[index % len(categories)]
+        text = note_text(rng, category, rng.randint(*lines))
+        font = load_font(rng.randint(34, 46), font_path)
+        name = f'note_{index:04d}_{category}'
+        path = os.path.join(out_dir, f'{name}.jpg')
+        render_note(text, rng, font).save(path, 'JPEG', quality=rng.randint(75, 92))
+        with open(os.path.join(out_dir, f'{name}.txt'), 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic handwritten-note corpus')
+    parser.add_argument('--out', required=True, help='Directory for the images and their .txt ground truth')
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--font', help='TrueType font to write with (e.g. a handwriting font)')
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out, args.count, args.seed, args.font)
+    print(f'Wrote {len(paths)} notes to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
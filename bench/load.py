@@ -0,0 +1,162 @@
+"""End-to-end load test of one backend's upload endpoint, offline.
+
+    python -m bench.load --target ai-text-sorter --requests 200 --concurrency 8 --json after.json
+    python -m bench.load --target image-organizer --latency-ms 800 --error-rate 0.05
+    python -m bench.load --target aura --url http://127.0.0.1:8000   # an already running server
+
+Unless ``--url`` is given, a FakeProviderServer (llm_client.fake_server)
+stands in for Perplexity/Gemini with the given latency and injected
+failures, and the backend is started with its production launcher, with
+all state in a scratch directory (bench.backends). Images come from
+``--corpus`` or a freshly generated synthetic one (bench.corpus). The JSON
+report has p50/p95/p99 latency and throughput and can be compared with
+``python -m bench.compare``.
+"""
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import mimetypes
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from llm_client.fake_server import FakeProviderServer
+from .backends import TARGETS, BackendProcess
+from .corpus import generate_corpus
+from .stats import summarize, environment, write_report, print_table
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def load_images(corpus):
+    images = []
+    for name in sorted(os.listdir(corpus)):
+        if name.lower().endswith(IMAGE_SUFFIXES):
+            with open(os.path.join(corpus, name), 'rb') as f:
+                images.append((name, f.read(), mimetypes.guess_type(name)[0] or 'application/octet-stream'))
+    if not images:
+        raise SystemExit(f'No images in {corpus}')
+    return images
+
+
+def succeeded(response):
+    if response.status_code >= 400:
+        return False
+    try:
+        # ai-text-sorter and image-organizer report failures in the body too
+        return response.json().get('success', True) is not False
+    except ValueError:
+        return False
+
+
+def run_load(base_url, endpoint, images, requests, concurrency, warmup=0, timeout=300):
+    """POST ``requests`` uploads with ``concurrency`` in flight; returns (summary, status counts)"""
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    with httpx.Client(base_url=base_url, timeout=timeout, limits=limits) as client:
+        def upload(index):
+            name, data, mimetype = images[index % len(images)]
+            start = time.perf_counter()
+            try:
+                response = client.post(endpoint, files={'file': (name, data, mimetype)})
+                ok, status = succeeded(response), response.status_code
+            except httpx.HTTPError as e:
+                ok, status = False, type(e).__name__
+            return ok, status, time.perf_counter() - start
+
+        # Warm-up requests load models and fill connection pools; they aren't counted
+        for index in range(warmup):
+            upload(index)
+
+        def timed(index):
+            ok, status, latency = upload(index)
+            with lock:
+                statuses[status] += 1
+                if ok:
+                    latencies.append(latency)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(timed, range(warmup, warmup + requests)))
+        elapsed = time.perf_counter() - start
+
+    return summarize(latencies, elapsed, errors=requests - len(latencies)), dict(statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end load test of a backend upload endpoint')
+    parser.add_argument('--target', required=True, choices=sorted(TARGETS))
+    parser.add_argument('--url', help='Test an already running server instead of starting one')
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=2, help='Uncounted requests before the measured run')
+    parser.add_argument('--workers', type=int, default=2, help='Server worker processes')
+    parser.add_argument('--corpus', help='Directory of images (default: a generated synthetic corpus)')
+    parser.add_argument('--corpus-size', type=int, default=20)
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Disable result caches and duplicate detection, so every request does the full work')
+    parser.add_argument('--latency-ms', type=float, default=300, help='Fake LLM response time')
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of LLM calls answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction answered with 429')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Fraction of JSON replies unparseable')
+    parser.add_argument('--json', help='Write the report to this file (default: stdout)')
+    parser.add_argument('--keep-workdir', action='store_true', help="Keep the scratch directory and server log")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix=f'bench-{args.target}-')
+    target = TARGETS[args.target]
+    fake = None
+    try:
+        corpus = args.corpus or os.path.join(workdir, 'corpus')
+        if not args.corpus:
+            generate_corpus(corpus, args.corpus_size)
+        images = load_images(corpus)
+
+        report = {'benchmark': 'load', 'target': args.target, 'params': {
+            key: value for key, value in vars(args).items() if key not in ('json', 'keep_workdir')},
+            'environment': environment()}
+
+        if args.url:
+            summary, statuses = run_load(args.url, target['endpoint'], images, args.requests, args.concurrency,
+                                         args.warmup)
+        else:
+            fake = FakeProviderServer(('127.0.0.1', 0), args.latency_ms / 1000, args.jitter_ms / 1000,
+                                      args.error_rate, args.rate_limit_rate, malformed_rate=args.malformed_rate)
+            fake.start_background()
+            with BackendProcess(args.target, free_port(), args.workers, fake.base_url, workdir,
+                                cache=not args.no_cache) as backend:
+                summary, statuses = run_load(backend.base_url, target['endpoint'], images, args.requests,
+                                             args.concurrency, args.warmup)
+            report['llm'] = dict(fake.counters)
+
+        report['status_codes'] = {str(status): count for status, count in statuses.items()}
+        report['results'] = {f"{args.target} {target['endpoint']} c={args.concurrency}": summary}
+        print_table(report['results'])
+        write_report(report, args.json)
+    finally:
+        if fake:
+            fake.shutdown()
+        if args.keep_workdir:
+            sys.stderr.write(f'Scratch directory kept: {workdir}\n')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Latency summaries and report plumbing shared by every benchmark.
+
+Every benchmark writes the same JSON shape, so any two reports can be fed to
+``python -m bench.compare``::
+
+    {"benchmark": ..., "params": {...}, "environment": {...},
+     "results": {"<name>": {"count", "errors", "error_rate", "elapsed_seconds",
+                            "throughput_per_second", "latency_ms": {"p50", "p95", "p99", ...}}}}
+"""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, q):
+    """The ``q``-th percentile (0-100) of already sorted values, interpolating between ranks"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, elapsed=None, errors=0):
+    """Summary of successful calls' latencies (seconds)
+
+    ``elapsed`` is the wall-clock time of the whole run; without it (one call
+    at a time) the latencies' sum is used, so throughput is calls per second.
+    """
+    values = sorted(latencies)
+    elapsed = elapsed if elapsed is not None else sum(values)
+    attempts = len(values) + errors
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'count': len(values),
+        'errors': errors,
+        'error_rate': round(errors / attempts, 4) if attempts else 0.0,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(values) / elapsed, 3) if elapsed else None,
+        'latency_ms': {
+            'p50': ms(percentile(values, 50)),
+            'p95': ms(percentile(values, 95)),
+            'p99': ms(percentile(values, 99)),
+            'mean': ms(sum(values) / len(values)) if values else None,
+            'min': ms(values[0]) if values else None,
+            'max': ms(values[-1]) if values else None,
+        },
+    }
+
+
+def environment():
+    """What the numbers were measured on, so reports from different machines aren't compared blindly"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def write_report(report, path=None):
+    """Write the report as JSON to ``path``, or to stdout without one"""
+    text = json.dumps(report, indent=2, default=str)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+def print_table(results, stream=sys.stderr):
+    """Human-readable summary next to the JSON"""
+    stream.write(f"{'benchmark':<44} {'count':>6} {'errors':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} "
+                 f"{'per sec':>9}\n")
+    for name, result in results.items():
+        if 'skipped' in result:
+            stream.write(f"{name:<44} skipped: {result['skipped']}\n")
+            continue
+        latency = result['latency_ms']
+        stream.write(f"{name:<44} {result['count']:>6} {result['errors']:>6} {_cell(latency['p50'])} "
+                     f"{_cell(latency['p95'])} {_cell(latency['p99'])} {_cell(result['throughput_per_second'], 9)}\n")
+
+
+def _cell(value, width=10):
+    return f"{value:>{width}.1f}" if value is not None else f"{'-':>{width}}"
@@ -1,67 +1,135 @@
+import io
 import os
+import sys
 import json
-import google.generativeai as genai
-from flask import Flask, request, jsonify, send_from_directory
+import base64
+import hashlib
+import binascii
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, send_from_directory, send_file, stream_with_context
 from flask_cors import CORS
 from PIL import Image
-import shutil
 from werkzeug.utils import secure_filename
 from config import Config
+from catalog import ImageCatalog, file_sha256
+from thumbnails import ThumbnailService
+from directory_store import DirectoryStore
+from embeddings import ClipEncoder, EmbeddingClassifier
+
+# Repository root, for the packages shared with the other backends
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from llm_client import LLMClient
+from image_dedup import DuplicateIndex
+from upload_staging import staging_request_class, place_file, reclaim_stale
+from batch import BatchUpload
 
 app = Flask(__name__)
 app.config.from_object(Config)
+# Uploads stream straight into uploads/ (hashed on the way) and are placed from there
+app.request_class = staging_request_class(Config.UPLOAD_FOLDER, Config.UPLOAD_MEMORY_BYTES)
 CORS(app)
 
-# Configure Gemini AI
-genai.configure(api_key=Config.GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Gemini is called through the shared pooled/rate-limited client
+llm = LLMClient(Config.LLM)
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
 
 # Ensure directories exist
 os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(Config.ORGANIZED_FOLDER, exist_ok=True)
 
-# File to store custom directories
-CUSTOM_DIRS_FILE = 'custom_directories.json'
+# Uploads left behind by interrupted requests (or by the old save-then-move upload path)
+freed = reclaim_stale(Config.UPLOAD_FOLDER, Config.STALE_UPLOAD_SECONDS,
+                      lambda name: name.startswith('.batch-') or allowed_file(name))
+if freed:
+    print(f"Reclaimed {freed / (1024 * 1024):.1f} MB of stale uploads")
+
+# Index of organized images, reconciled with the disk at startup
+catalog = ImageCatalog(Config.CATALOG_DB, Config.ORGANIZED_FOLDER)
+print(f"Catalogue reconciled: {catalog.reconcile()}")
+
+# Grid thumbnails: generated in the background after upload, or on first request
+thumbnails = ThumbnailService(Config.THUMBNAIL_FOLDER, Config.THUMBNAIL_SIZES, Config.THUMBNAIL_FORMAT,
+                              Config.THUMBNAIL_QUALITY, Config.THUMBNAIL_CACHE_BYTES, Config.THUMBNAIL_WORKERS)
+
+# Perceptual hashes of the organized images, so near-duplicate uploads skip Gemini
+duplicates = DuplicateIndex(Config.DEDUP_DB, Config.DEDUP_MAX_DISTANCE) if Config.DEDUP_ENABLED else None
+
+# CLIP embeddings of the organized images and custom directories, so confident cases skip Gemini
+embeddings = None
+if Config.EMBEDDINGS_ENABLED:
+    embeddings = EmbeddingClassifier(ClipEncoder(Config.EMBEDDING_MODEL), Config.EMBEDDING_DB,
+                                     Config.EMBEDDING_NEIGHBOURS, Config.EMBEDDING_IMAGE_SIMILARITY,
+                                     Config.EMBEDDING_TEXT_MARGIN, Config.EMBEDDING_TEXT_SIMILARITY)
+
+def index_missing_images():
+    """Hash and embed organized images that aren't indexed yet (e.g. from before the indexes existed)"""
+    hashed = embedded = 0
+    for category, filename, content_hash in catalog.entries():
+        key = f'{category}/{filename}'
+        path = os.path.join(Config.ORGANIZED_FOLDER, category, filename)
+        try:
+            if duplicates is not None and key not in duplicates:
+                duplicates.add(key, duplicates.hash_image(path),
+                               {'category': category, 'filename': filename, 'sha256': content_hash})
+                hashed += 1
+            if embeddings is not None and key not in embeddings:
+                vector = embeddings.embed(path)
+                if vector is not None:
+                    embeddings.add(key, category, vector)
+                    embedded += 1
+        except Exception as e:
+            print(f"Error indexing {key}: {e}")
+    if hashed or embedded:
+        print(f"Indexed existing images: {hashed} hashed, {embedded} embedded")
 
-def load_custom_directories():
-    """Load custom directories from JSON file"""
-    if os.path.exists(CUSTOM_DIRS_FILE):
-        with open(CUSTOM_DIRS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+def start_background_indexing():
+    # Not at import: workers forked from a preloaded parent must not inherit a half-run thread
+    if duplicates is not None or embeddings is not None:
+        threading.Thread(target=index_missing_images, name='index-images', daemon=True).start()
 
-def save_custom_directories(directories):
-    """Save custom directories to JSON file"""
-    with open(CUSTOM_DIRS_FILE, 'w') as f:
-        json.dump(directories, f, indent=2)
+def preload():
+    """Load the CLIP model in the parent process, so forked workers share its weights"""
+    import gc
+    if embeddings is not None:
+        embeddings.encoder.available
+    gc.freeze()
 
-def analyze_image_with_custom_dirs(image_path, custom_directories):
+def drain():
+    """Let background work finish before the process exits"""
+    classifier_pool.shutdown(wait=True, cancel_futures=True)
+    thumbnails.close()
+
+# Classifies the files of /upload/batch requests; shared, so concurrent batches don't multiply the
+# Gemini calls in flight (the LLM client's own concurrency and rate limits still apply on top)
+classifier_pool = ThreadPoolExecutor(max_workers=Config.BATCH_WORKERS, thread_name_prefix='classify')
+
+# Custom directories, cached in memory and reloaded only when the file changes
+directory_store = DirectoryStore(Config.CUSTOM_DIRS_FILE)
+
+def analyze_image_with_custom_dirs(image_path, snapshot, image_bytes=None):
     """Use Gemini to analyze image and choose the best custom directory"""
     try:
-        image = Image.open(image_path)
-        
-        if not custom_directories:
+        if not snapshot.directories:
             # If no custom directories exist, return "uncategorized"
             return "uncategorized"
         
-        # Create prompt with custom directories
-        dir_list = "\n".join([f"- {name}: {desc}" for name, desc in custom_directories.items()])
-        prompt = f"""
-        Analyze this image and determine which of these custom directories it should be placed in:
-
-        {dir_list}
-
-        Based on the image content, return ONLY the directory name that best matches the image.
-        If none of the directories are suitable, return "uncategorized".
-        Return only the directory name, nothing else.
-        """
+        if image_bytes is None:
+            with open(image_path, 'rb') as f:
+                image_bytes = f.read()
+        image = Image.open(io.BytesIO(image_bytes))
+        mime_type = Image.MIME.get(image.format, 'image/jpeg')
         
-        response = model.generate_content([prompt, image])
-        result = response.text.strip().lower()
+        # The prompt listing the custom directories is prebuilt with each snapshot
+        response = llm.generate('gemini', Config.GEMINI_MODEL, snapshot.prompt, images=[(mime_type, image_bytes)])
         
         # Validate if result matches any custom directory
-        if result in [name.lower() for name in custom_directories.keys()]:
-            return result
+        name = snapshot.find(response.text)
+        if name is not None:
+            return name.lower()
         
         # If no match or invalid response, return "uncategorized"
         return "uncategorized"
@@ -70,11 +138,81 @@ def analyze_image_with_custom_dirs(image_path, custom_directories):
         print(f"Error analyzing image: {e}")
         return "uncategorized"
 
+def classify_image(image_path, snapshot, image_bytes=None, content_hash=None):
+    """Choose the category for an uploaded image, cheapest way first
+
+    1. a near-duplicate of an organized image in a current custom directory
+       reuses its category (``duplicate`` is its index entry, with ``path``
+       set when the upload is byte-identical to it);
+    2. the local embedding classifier, when it is confident;
+    3. Gemini.
+
+    The image is decoded from ``image_bytes`` when the upload is in memory.
+    Returns a dict with the ``category``, how it was ``decided_by``, and the
+    image's perceptual hash and embedding for indexing it once organized.
+    """
+    def source():
+        return io.BytesIO(image_bytes) if image_bytes is not None else image_path
+
+    result = {'image_hash': None, 'duplicate': None, 'embedding': None}
+    if duplicates is not None:
+        try:
+            result['image_hash'] = duplicates.hash_image(source())
+        except Exception as e:
+            print(f"Error hashing image: {e}")
+
+    if result['image_hash'] is not None:
+        def reusable(entry):
+            return (entry['category'].casefold() in snapshot.lookup
+                    and catalog.get_hash(entry['category'], entry['filename']) is not None)
+
+        duplicate = duplicates.find(result['image_hash'], reusable)
+        if duplicate is not None:
+            if duplicate['sha256'] == (content_hash or file_sha256(image_path)):
+                duplicate['path'] = os.path.join(Config.ORGANIZED_FOLDER, duplicate['category'], duplicate['filename'])
+            return {**result, 'category': duplicate['category'], 'decided_by': 'duplicate', 'duplicate': duplicate}
+
+    if embeddings is not None and snapshot.directories:
+        try:
+            result['embedding'] = embeddings.embed(source())
+            category, decided_by = embeddings.classify(result['embedding'], snapshot)
+            if category is not None:
+                return {**result, 'category': category, 'decided_by': decided_by}
+        except Exception as e:
+            print(f"Error embedding image: {e}")
+
+    return {**result, 'category': analyze_image_with_custom_dirs(image_path, snapshot, image_bytes),
+            'decided_by': 'gemini' if snapshot.directories else 'no_directories'}
+
+def index_image(category, filename, content_hash, classification):
+    """Add a newly organized image to the duplicate and embedding indexes"""
+    key = f'{category}/{filename}'
+    if duplicates is not None and classification['image_hash'] is not None:
+        duplicates.add(key, classification['image_hash'],
+                       {'category': category, 'filename': filename, 'sha256': content_hash})
+    if embeddings is not None and classification['embedding'] is not None:
+        embeddings.add(key, category, classification['embedding'])
+
+def duplicate_of(classification):
+    duplicate = classification['duplicate']
+    return f"{duplicate['category']}/{duplicate['filename']}" if duplicate else None
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Report LLM call and thumbnail cache metrics"""
+    return jsonify({'status': 'healthy', 'llm': llm.stats(), 'thumbnails': thumbnails.stats(),
+                    'duplicates': duplicates.stats() if duplicates is not None else None,
+                    'embeddings': embeddings.stats() if embeddings is not None else None})
+
+def refresh_directory_embeddings():
+    """Embed a new directory (or forget a deleted one) in the background, ahead of the next upload"""
+    if embeddings is not None:
+        classifier_pool.submit(embeddings.sync_directories, directory_store.snapshot())
+
 @app.route('/custom-directories', methods=['GET'])
 def get_custom_directories():
     """Get all custom directories"""
-    directories = load_custom_directories()
-    return jsonify(directories)
+    return jsonify(directory_store.snapshot().directories)
 
 @app.route('/custom-directories', methods=['POST'])
 def create_custom_directory():
@@ -90,20 +228,20 @@ def create_custom_directory():
     if not name:
         return jsonify({'error': 'Directory name cannot be empty'}), 400
     
-    # Load existing directories
-    directories = load_custom_directories()
-    
-    # Check if directory already exists
-    if name.lower() in [d.lower() for d in directories.keys()]:
+    def add_directory(directories):
+        # Checked under the store's lock, so two requests can't both create it
+        if name.casefold() in (d.casefold() for d in directories):
+            return False
+        directories[name] = description
+        return True
+
+    if not directory_store.update(add_directory):
         return jsonify({'error': 'Directory already exists'}), 400
     
-    # Add new directory
-    directories[name] = description
-    save_custom_directories(directories)
-    
     # Create physical directory
     dir_path = os.path.join(Config.ORGANIZED_FOLDER, name.lower())
     os.makedirs(dir_path, exist_ok=True)
+    refresh_directory_embeddings()
     
     return jsonify({
         'success': True,
@@ -115,21 +253,18 @@ def create_custom_directory():
 @app.route('/custom-directories/<directory_name>', methods=['DELETE'])
 def delete_custom_directory(directory_name):
     """Delete a custom directory"""
-    directories = load_custom_directories()
-    
-    # Find the directory (case-insensitive)
-    actual_name = None
-    for name in directories.keys():
-        if name.lower() == directory_name.lower():
-            actual_name = name
-            break
-    
+    def remove_directory(directories):
+        # Find the directory (case-insensitive)
+        for name in directories:
+            if name.casefold() == directory_name.casefold():
+                del directories[name]
+                return name
+        return None
+
+    actual_name = directory_store.update(remove_directory)
     if not actual_name:
         return jsonify({'error': 'Directory not found'}), 404
-    
-    # Remove from custom directories
-    del directories[actual_name]
-    save_custom_directories(directories)
+    refresh_directory_embeddings()
     
     # Remove physical directory if it exists and is empty
     dir_path = os.path.join(Config.ORGANIZED_FOLDER, directory_name.lower())
@@ -163,32 +298,29 @@ def upload_file():
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Already streamed into uploads/ and hashed while the request was read
+        staged = file.stream
+        filepath = staged.finish()
         
-        # Load custom directories
-        custom_directories = load_custom_directories()
-        
-        # Analyze image with custom directories in mind
-        category = analyze_image_with_custom_dirs(filepath, custom_directories)
+        # Analyze image with the current custom directories in mind
+        classification = classify_image(filepath, directory_store.snapshot(), staged.data, staged.sha256)
+        category, duplicate = classification['category'], classification['duplicate']
         
         # Create category directory (either custom or uncategorized)
         category_dir = os.path.join(Config.ORGANIZED_FOLDER, category)
         os.makedirs(category_dir, exist_ok=True)
         
-        # Move file to category directory
+        # Move file to category directory, renaming it if the name is taken;
+        # an identical copy of an organized image becomes another link to it
+        if duplicate and duplicate.get('path'):
+            filename = place_file(duplicate['path'], category_dir, filename, keep_source=True)
+            os.remove(filepath)
+        else:
+            filename = place_file(filepath, category_dir, filename)
         new_filepath = os.path.join(category_dir, filename)
-        counter = 1
-        original_filename = filename
-        
-        # Handle duplicate filenames
-        while os.path.exists(new_filepath):
-            name, ext = os.path.splitext(original_filename)
-            filename = f"{name}_{counter}{ext}"
-            new_filepath = os.path.join(category_dir, filename)
-            counter += 1
-        
-        shutil.move(filepath, new_filepath)
+        content_hash = catalog.add(category, filename, staged.sha256)
+        index_image(category, filename, content_hash, classification)
+        thumbnails.schedule(new_filepath, content_hash)
         
         # Check if this was a custom directory choice
         is_custom = category != "uncategorized"
@@ -198,58 +330,209 @@ def upload_file():
             'category': category,
             'filename': filename,
             'is_custom_directory': is_custom,
+            'decided_by': classification['decided_by'],
+            'duplicate_of': duplicate_of(classification),
             'message': f'Image organized into {category} folder'
         })
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """Organize many images (or zips of images) in one request, streaming NDJSON events as files are classified
+
+    Events: ``accepted`` (total and skipped files), one ``classified`` per file
+    as it finishes, one ``organized`` per file once the whole batch has been
+    moved into place, then ``done``; or ``error`` if the batch was rolled back.
+    """
+    request.max_content_length = Config.BATCH_MAX_CONTENT_LENGTH
+    files = request.files.getlist('files')
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+
+    batch = BatchUpload(Config.UPLOAD_FOLDER, allowed_file, Config.BATCH_MAX_FILES, Config.BATCH_MAX_EXTRACT_BYTES)
+    try:
+        for file in files:
+            batch.add(file)
+    except ValueError as e:
+        batch.discard()
+        return jsonify({'error': str(e)}), 400
+    if not batch.items:
+        batch.discard()
+        return jsonify({'error': 'No valid images provided', 'skipped': batch.skipped}), 400
+
+    # One snapshot for the whole batch, so every file is classified against the same directories
+    snapshot = directory_store.snapshot()
+
+    def events():
+        try:
+            yield ndjson({'event': 'accepted', 'total': len(batch.items), 'skipped': batch.skipped})
+            classifications, categories, link_to = {}, {}, {}
+            classify = lambda item: classify_image(item['path'], snapshot, content_hash=item['sha256'])
+            for item, classification in batch.classify(classifier_pool, classify):
+                index = item['index']
+                classifications[index], categories[index] = classification, classification['category']
+                if classification['duplicate'] and classification['duplicate'].get('path'):
+                    link_to[index] = classification['duplicate']['path']
+                yield ndjson({'event': 'classified', 'index': index, 'original': item['original'],
+                              'category': classification['category'], 'decided_by': classification['decided_by'],
+                              'duplicate_of': duplicate_of(classification),
+                              'completed': len(categories), 'total': len(batch.items)})
+
+            try:
+                organized = batch.commit(categories, Config.ORGANIZED_FOLDER, catalog, link_to)
+            except Exception as e:
+                print(f"Error organizing batch: {e}")
+                yield ndjson({'event': 'error', 'error': 'Could not organize the batch; no files were moved'})
+                return
+
+            for item, category, filename, content_hash in organized:
+                index_image(category, filename, content_hash, classifications[item['index']])
+                thumbnails.schedule(os.path.join(Config.ORGANIZED_FOLDER, category, filename), content_hash)
+                yield ndjson({
+                    'event': 'organized',
+                    'index': item['index'],
+                    'original': item['original'],
+                    'success': True,
+                    'category': category,
+                    'filename': filename,
+                    'is_custom_directory': category != "uncategorized",
+                    'decided_by': classifications[item['index']]['decided_by'],
+                    'duplicate_of': duplicate_of(classifications[item['index']]),
+                    'message': f'Image organized into {category} folder'
+                })
+            yield ndjson({'event': 'done', 'organized': len(organized), 'skipped': len(batch.skipped)})
+        finally:
+            # Also runs when the client disconnects: whatever wasn't committed is dropped
+            batch.discard()
+
+    return app.response_class(stream_with_context(events()), mimetype='application/x-ndjson',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def ndjson(event):
+    return json.dumps(event) + '\n'
+
+def make_etag(*parts):
+    return hashlib.sha1('\0'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:20]
+
+def conditional_json(etag, last_modified, build_payload):
+    """JSON response carrying ETag/Last-Modified; answers 304 without building the payload when the client's copy is current"""
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = bool(request.if_modified_since and last_modified
+                     and int(last_modified) <= request.if_modified_since.timestamp())
+    response = app.response_class(status=304) if fresh else jsonify(build_payload())
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Browsers keep the listing but revalidate it on every use
+    response.cache_control.no_cache = True
+    return response
+
+def encode_cursor(filename):
+    return base64.urlsafe_b64encode(filename.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    return base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+
 @app.route('/categories', methods=['GET'])
 def get_categories():
     """Get all organized categories and their file counts"""
+    version, last_modified = catalog.version()
+    snapshot = directory_store.snapshot()
+    dirs_mtime = snapshot.version[0] / 1e9 if snapshot.version else 0
+    return conditional_json(make_etag(version, snapshot.version), max(last_modified or 0, dirs_mtime) or None,
+                            lambda: build_categories(snapshot))
+
+def build_categories(snapshot):
     categories = {}
-    custom_directories = load_custom_directories()
-    
-    if os.path.exists(Config.ORGANIZED_FOLDER):
-        for category in os.listdir(Config.ORGANIZED_FOLDER):
-            category_path = os.path.join(Config.ORGANIZED_FOLDER, category)
-            if os.path.isdir(category_path):
-                file_count = len([f for f in os.listdir(category_path) 
-                                if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))])
-                
-                # Check if this is a custom directory
-                is_custom = category.lower() in [name.lower() for name in custom_directories.keys()]
-                
-                categories[category] = {
-                    'count': file_count,
-                    'is_custom': is_custom,
-                    'description': custom_directories.get(category, '') if is_custom else ''
-                }
+    counts = catalog.counts()
+
+    # Custom directories are listed even while they are still empty
+    empty_custom = {name.lower() for name in snapshot.directories
+                    if name.lower() not in counts and os.path.isdir(os.path.join(Config.ORGANIZED_FOLDER, name.lower()))}
+    for category in set(counts) | empty_custom:
+        categories[category] = {
+            'count': counts.get(category, 0),
+            'is_custom': category.casefold() in snapshot.lookup,
+            'description': snapshot.descriptions.get(category.casefold(), '')
+        }
     
-    return jsonify(categories)
+    return categories
 
 @app.route('/category/<category_name>', methods=['GET'])
 def get_category_files(category_name):
-    """Get all files in a specific category"""
+    """Get one page of files in a category (?limit=&cursor=), ordered by filename"""
     category_path = os.path.join(Config.ORGANIZED_FOLDER, category_name)
     if not os.path.exists(category_path):
         return jsonify({'error': 'Category not found'}), 404
-    
-    files = [f for f in os.listdir(category_path) 
-             if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))]
-    
-    return jsonify({'files': files})
+
+    limit = min(max(request.args.get('limit', Config.DEFAULT_PAGE_SIZE, type=int), 1), Config.MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except (binascii.Error, UnicodeError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    def build_page():
+        files, next_after, total = catalog.list(category_name, limit, after)
+        return {'files': files, 'total': total, 'limit': limit,
+                'next_cursor': encode_cursor(next_after) if next_after else None}
+
+    version, last_modified = catalog.version(category_name)
+    return conditional_json(make_etag(category_name, version, limit, cursor), last_modified, build_page)
 
 @app.route('/image/<category>/<filename>')
 def serve_image(category, filename):
     """Serve organized images"""
+    # send_file adds ETag/Last-Modified and answers conditional requests with 304
     return send_from_directory(
         os.path.join(Config.ORGANIZED_FOLDER, category), 
-        filename
+        filename,
+        max_age=Config.IMAGE_MAX_AGE
     )
 
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+@app.route('/thumb/<int:size>/<category>/<filename>')
+def serve_thumbnail(size, category, filename):
+    """Serve a thumbnail of an organized image, generating it on first request"""
+    if size not in thumbnails.sizes:
+        return jsonify({'error': f'Thumbnail size must be one of {list(thumbnails.sizes)}'}), 404
+
+    content_hash = catalog.get_hash(category, filename)
+    if content_hash is None:
+        return jsonify({'error': 'Image not found'}), 404
+
+    try:
+        path = thumbnails.get(os.path.join(Config.ORGANIZED_FOLDER, category, filename), content_hash, size)
+    except Exception as e:
+        print(f"Error generating thumbnail: {e}")
+        return jsonify({'error': 'Could not generate thumbnail'}), 500
+
+    return send_file(path, mimetype=thumbnails.mimetype, etag=f'{content_hash}-{size}',
+                     max_age=Config.THUMBNAIL_MAX_AGE)
+
+@app.route('/image/<category>/<filename>', methods=['DELETE'])
+def delete_image(category, filename):
+    """Delete an organized image"""
+    if any(part in ('.', '..') or os.path.basename(part) != part for part in (category, filename)):
+        return jsonify({'error': 'Invalid path'}), 400
+
+    filepath = os.path.join(Config.ORGANIZED_FOLDER, category, filename)
+    if not os.path.isfile(filepath):
+        return jsonify({'error': 'Image not found'}), 404
+
+    os.remove(filepath)
+    catalog.remove(category, filename)
+    if duplicates is not None:
+        duplicates.remove(f'{category}/{filename}')
+    if embeddings is not None:
+        embeddings.remove(f'{category}/{filename}')
+    return jsonify({'success': True, 'message': f'Deleted {filename} from {category}'})
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server; serve.py runs the app under gunicorn for production.
+    # The debug reloader imports this module twice: only the serving child indexes
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_indexing()
+    app.run(debug=Config.DEBUG, host=Config.SERVER_HOST, port=Config.SERVER_PORT)
\ No newline at end of file
@@ -0,0 +1,111 @@
+import os
+import uuid
+import shutil
+import zipfile
+from concurrent.futures import as_completed
+from werkzeug.utils import secure_filename
+from upload_staging import place_file
+
+
+class BatchUpload:
+    """Files of one /upload/batch request, staged in a private directory until the whole batch is committed
+
+    ``classify`` runs the classifier on every staged file in a shared pool and
+    yields results as they finish. ``commit`` then moves all of them into their
+    categories and records them in one catalogue transaction; if anything
+    fails, the files already moved are taken out again, so the batch is
+    either organized completely or not at all.
+    """
+
+    def __init__(self, upload_folder, allowed_file, max_files, max_extract_bytes):
+        self.staging_dir = os.path.join(upload_folder, f'.batch-{uuid.uuid4().hex}')
+        self.allowed_file = allowed_file
+        self.max_files = max_files
+        self.max_extract_bytes = max_extract_bytes
+        self.items = []  # [{'index', 'original', 'filename', 'path', 'sha256'}]
+        self.skipped = []
+        os.makedirs(self.staging_dir)
+
+    def add(self, file):
+        """Stage one uploaded file; zip archives are unpacked"""
+        if file.filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    self._add_archive(archive)
+            except zipfile.BadZipFile:
+                self.skipped.append({'original': file.filename, 'error': 'Not a valid zip file'})
+        elif self._accept(file.filename):
+            # Streamed into uploads/ already: move it into the batch, and keep the hash taken on the way
+            os.replace(file.stream.finish(), self._stage_path(file.filename))
+            self.items[-1]['sha256'] = file.stream.sha256
+
+    def _add_archive(self, archive):
+        extracted = 0
+        for info in archive.infolist():
+            if info.is_dir() or not self._accept(info.filename):
+                continue
+            # zipfile stops reading an entry at its declared size, so this bounds the real output too
+            extracted += info.file_size
+            if extracted > self.max_extract_bytes:
+                raise ValueError('Archive is too large once extracted')
+            path = self._stage_path(info.filename)
+            with archive.open(info) as source, open(path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1 << 20)
+
+    def _accept(self, original):
+        if not self.allowed_file(original) or not secure_filename(os.path.basename(original)):
+            self.skipped.append({'original': original, 'error': 'Invalid file type'})
+            return False
+        if len(self.items) >= self.max_files:
+            raise ValueError(f'A batch can hold at most {self.max_files} images')
+        return True
+
+    def _stage_path(self, original):
+        index = len(self.items)
+        # Prefixed with the index, so files with the same name don't collide while staged
+        path = os.path.join(self.staging_dir, f'{index}_{secure_filename(os.path.basename(original))}')
+        self.items.append({'index': index, 'original': original,
+                           'filename': secure_filename(os.path.basename(original)), 'path': path, 'sha256': None})
+        return path
+
+    def classify(self, pool, classify):
+        """Yield ``(item, category)`` as each file's classification finishes"""
+        futures = {pool.submit(classify, item): item for item in self.items}
+        try:
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            # Client went away or something failed: don't classify the rest
+            for future in futures:
+                future.cancel()
+
+    def commit(self, categories, organized_folder, catalog, link_to=None):
+        """Move every staged file into ``categories[index]`` and catalogue them; all or nothing
+
+        Files with an entry in ``link_to`` (index -> path of an identical
+        organized file) are stored as another link to that file instead.
+        Returns ``[(item, category, filename, content_hash)]`` in upload order.
+        """
+        link_to = link_to or {}
+        placed = []
+        try:
+            for item in self.items:
+                category = categories[item['index']]
+                category_dir = os.path.join(organized_folder, category)
+                os.makedirs(category_dir, exist_ok=True)
+                if item['index'] in link_to:
+                    filename = place_file(link_to[item['index']], category_dir, item['filename'], keep_source=True)
+                    os.remove(item['path'])
+                else:
+                    filename = place_file(item['path'], category_dir, item['filename'])
+                placed.append((item, category, filename))
+            hashes = catalog.add_many([(category, filename, item['sha256']) for item, category, filename in placed])
+        except Exception:
+            for item, category, filename in placed:
+                os.replace(os.path.join(organized_folder, category, filename), item['path'])
+            raise
+        return [(item, category, filename, content_hash)
+                for (item, category, filename), content_hash in zip(placed, hashes)]
+
+    def discard(self):
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
@@ -0,0 +1,163 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+
+def file_sha256(path):
+    """Hash a file in 1MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ImageCatalog:
+    """SQLite index of the organized images: one row per file"""
+
+    def __init__(self, db_path, root):
+        self.db_path = db_path
+        self.root = root
+        self.local = threading.local()
+        self.conn.executescript('''
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS images (
+                category TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                modified_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (category, filename)
+            ) WITHOUT ROWID;
+
+            -- Bumped on every change, so listings can be revalidated without querying them
+            CREATE TABLE IF NOT EXISTS categories (
+                category TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            INSERT OR IGNORE INTO categories
+                SELECT category, 1, MAX(created_at) FROM images GROUP BY category;
+            CREATE TRIGGER IF NOT EXISTS images_inserted AFTER INSERT ON images BEGIN
+                INSERT INTO categories VALUES (NEW.category, 1, strftime('%s', 'now'))
+                ON CONFLICT (category) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+            END;
+            CREATE TRIGGER IF NOT EXISTS images_updated AFTER UPDATE ON images BEGIN
+                UPDATE categories SET version = version + 1, updated_at = strftime('%s', 'now')
+                WHERE category = NEW.category;
+            END;
+            CREATE TRIGGER IF NOT EXISTS images_deleted AFTER DELETE ON images BEGIN
+                UPDATE categories SET version = version + 1, updated_at = strftime('%s', 'now')
+                WHERE category = OLD.category;
+            END;
+        ''')
+
+    @property
+    def conn(self):
+        """One connection per thread (Flask serves requests on several)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+        return conn
+
+    def add(self, category, filename, content_hash=None):
+        """Record (or refresh) a file that now exists under the category directory; returns its hash
+
+        Pass ``content_hash`` when it is already known (e.g. computed while uploading) to skip re-reading the file.
+        """
+        path = os.path.join(self.root, category, filename)
+        stat = os.stat(path)
+        content_hash = content_hash or file_sha256(path)
+        self.conn.execute('''INSERT INTO images (category, filename, size, hash, modified_at, created_at)
+                             VALUES (?, ?, ?, ?, ?, ?)
+                             ON CONFLICT (category, filename) DO UPDATE SET
+                             size = excluded.size, hash = excluded.hash, modified_at = excluded.modified_at''',
+                          (category, filename, stat.st_size, content_hash, stat.st_mtime, time.time()))
+        return content_hash
+
+    def add_many(self, entries):
+        """``add`` every (category, filename, content_hash or None) in one transaction; returns their hashes"""
+        self.conn.execute('BEGIN')
+        try:
+            hashes = [self.add(*entry) for entry in entries]
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return hashes
+
+    def get_hash(self, category, filename):
+        row = self.conn.execute('SELECT hash FROM images WHERE category = ? AND filename = ?',
+                                (category, filename)).fetchone()
+        return row['hash'] if row else None
+
+    def remove(self, category, filename):
+        self.conn.execute('DELETE FROM images WHERE category = ? AND filename = ?', (category, filename))
+
+    def reconcile(self):
+        """Bring the catalogue in line with the files on disk; only new or changed files are hashed"""
+        known = {(row['category'], row['filename']): (row['size'], row['modified_at'])
+                 for row in self.conn.execute('SELECT category, filename, size, modified_at FROM images')}
+        added = updated = 0
+        self.conn.execute('BEGIN')
+        try:
+            with os.scandir(self.root) as categories:
+                for category in categories:
+                    if not category.is_dir():
+                        continue
+                    with os.scandir(category.path) as entries:
+                        for entry in entries:
+                            if not entry.is_file() or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                                continue
+                            stat = entry.stat()
+                            state = known.pop((category.name, entry.name), None)
+                            if state != (stat.st_size, stat.st_mtime):
+                                self.add(category.name, entry.name)
+                                added, updated = (added + 1, updated) if state is None else (added, updated + 1)
+
+            # Whatever is left was deleted or moved outside the app
+            self.conn.executemany('DELETE FROM images WHERE category = ? AND filename = ?', list(known))
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return {'added': added, 'updated': updated, 'removed': len(known)}
+
+    def entries(self):
+        """(category, filename, hash) of every image"""
+        return [(row['category'], row['filename'], row['hash'])
+                for row in self.conn.execute('SELECT category, filename, hash FROM images')]
+
+    def counts(self):
+        """Number of images per category"""
+        return {row['category']: row['n'] for row in
+                self.conn.execute('SELECT category, COUNT(*) AS n FROM images GROUP BY category')}
+
+    def list(self, category, limit, after=None):
+        """A page of filenames in a category, ordered by name, starting after ``after``
+
+        Returns the page, the cursor for the next page (None on the last one)
+        and the category's total.
+        """
+        total = self.conn.execute('SELECT COUNT(*) FROM images WHERE category = ?', (category,)).fetchone()[0]
+        rows = self.conn.execute('''SELECT filename FROM images WHERE category = ? AND filename > ?
+                                    ORDER BY filename LIMIT ?''', (category, after or '', limit + 1))
+        files = [row['filename'] for row in rows]
+        next_after = files[limit - 1] if len(files) > limit else None
+        return files[:limit], next_after, total
+
+    def version(self, category=None):
+        """(version, last-modified timestamp) of one category, or of the whole catalogue"""
+        if category is not None:
+            row = self.conn.execute('SELECT version, updated_at FROM categories WHERE category = ?',
+                                    (category,)).fetchone()
+            return (row['version'], row['updated_at']) if row else (0, None)
+        row = self.conn.execute('SELECT COUNT(*), TOTAL(version), MAX(updated_at) FROM categories').fetchone()
+        return f'{row[0]}.{int(row[1])}', row[2]
@@ -5,6 +5,73 @@ load_dotenv()
 
 class Config:
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    UPLOAD_FOLDER = '../uploads'
-    ORGANIZED_FOLDER = '../uploads/organized'
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
\ No newline at end of file
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta')
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', '../uploads')
+    ORGANIZED_FOLDER = os.getenv('ORGANIZED_FOLDER', '../uploads/organized')
+    CUSTOM_DIRS_FILE = os.getenv('CUSTOM_DIRS_FILE', 'custom_directories.json')
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    UPLOAD_MEMORY_BYTES = int(os.getenv('UPLOAD_MEMORY_MB', 16)) * 1024 * 1024  # requests up to this size are also decoded from memory
+    STALE_UPLOAD_SECONDS = int(os.getenv('STALE_UPLOAD_SECONDS', 3600))  # leftovers in uploads/ older than this are deleted at startup
+    CATALOG_DB = os.getenv('CATALOG_DB', '../uploads/catalog.db')
+    DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 100))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+    IMAGE_MAX_AGE = int(os.getenv('IMAGE_MAX_AGE', 3600))  # seconds browsers may reuse an image unchecked
+
+    # /upload/batch: many files (or zips) per request, classified concurrently
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+    BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 500))
+    BATCH_MAX_CONTENT_LENGTH = int(os.getenv('BATCH_MAX_MB', 512)) * 1024 * 1024
+    BATCH_MAX_EXTRACT_BYTES = int(os.getenv('BATCH_MAX_EXTRACT_MB', 1024)) * 1024 * 1024
+
+    # Near-duplicate uploads reuse the category of an organized image within this many bits (of 64)
+    DEDUP_ENABLED = os.getenv('DEDUP_ENABLED', 'true').lower() == 'true'
+    DEDUP_DB = os.getenv('DEDUP_DB', '../uploads/duplicates.db')
+    DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', 4))
+
+    # Local CLIP classifier: decides confident cases itself, sends ambiguous ones to Gemini.
+    # Needs torch and transformers; without them every image goes to Gemini as before
+    EMBEDDINGS_ENABLED = os.getenv('EMBEDDINGS_ENABLED', 'true').lower() == 'true'
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'openai/clip-vit-base-patch32')
+    EMBEDDING_DB = os.getenv('EMBEDDING_DB', '../uploads/embeddings.db')
+    EMBEDDING_NEIGHBOURS = int(os.getenv('EMBEDDING_NEIGHBOURS', 5))
+    EMBEDDING_IMAGE_SIMILARITY = float(os.getenv('EMBEDDING_IMAGE_SIMILARITY', 0.85))
+    EMBEDDING_TEXT_MARGIN = float(os.getenv('EMBEDDING_TEXT_MARGIN', 0.03))  # cosine over the runner-up
+    EMBEDDING_TEXT_SIMILARITY = float(os.getenv('EMBEDDING_TEXT_SIMILARITY', 0.25))
+
+    # Thumbnails for the grids, cached by content hash
+    THUMBNAIL_FOLDER = os.getenv('THUMBNAIL_FOLDER', '../uploads/thumbnails')
+    THUMBNAIL_SIZES = [int(size) for size in os.getenv('THUMBNAIL_SIZES', '128,256,512').split(',')]
+    THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'WEBP')
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+    THUMBNAIL_CACHE_BYTES = int(os.getenv('THUMBNAIL_CACHE_MB', 512)) * 1024 * 1024
+    THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+    THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', 7 * 24 * 3600))
+
+    # Server: app.py runs Flask's development server, serve.py (gunicorn.conf.py) the production one.
+    # Each worker process keeps its own in-memory indexes, so scale with threads first:
+    # most of a request is spent waiting for Gemini
+    DEBUG = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
+    SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', 5000))
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 1))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', 16))
+    SERVER_PRELOAD = os.getenv('SERVER_PRELOAD', 'true').lower() == 'true'  # load CLIP once before forking
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 300))  # /upload/batch requests can run for minutes
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', 60))
+
+    # Shared LLM client: connection pool, concurrency limits, rate limit, retries
+    LLM = {
+        'max_concurrency': int(os.getenv('LLM_MAX_CONCURRENCY', 8)),
+        'providers': {
+            'gemini': {
+                'kind': 'gemini',
+                'base_url': GEMINI_BASE_URL,
+                'api_key': GEMINI_API_KEY,
+                'max_concurrency': int(os.getenv('GEMINI_MAX_CONCURRENCY', 4)),
+                'rate_per_second': float(os.getenv('GEMINI_RATE_PER_SECOND', 0)) or None,
+                'max_retries': int(os.getenv('GEMINI_MAX_RETRIES', 3)),
+                'timeout': 60,
+            }
+        }
+    }
\ No newline at end of file
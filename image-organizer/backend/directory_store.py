@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+PROMPT_TEMPLATE = """
+        Analyze this image and determine which of these custom directories it should be placed in:
+
+        {dir_list}
+
+        Based on the image content, return ONLY the directory name that best matches the image.
+        If none of the directories are suitable, return "uncategorized".
+        Return only the directory name, nothing else.
+        """
+
+
+class DirectorySnapshot:
+    """One immutable version of the custom directories, with its lookups and prompt prebuilt"""
+
+    def __init__(self, directories, version):
+        self.directories = directories
+        self.version = version
+        # Case-folded name -> name as created
+        self.lookup = {name.casefold(): name for name in directories}
+        self.descriptions = {name.casefold(): description for name, description in directories.items()}
+        dir_list = "\n".join([f"- {name}: {desc}" for name, desc in directories.items()])
+        self.prompt = PROMPT_TEMPLATE.format(dir_list=dir_list) if directories else None
+
+    def find(self, name):
+        """The directory's name as created, matched case-insensitively, or None"""
+        return self.lookup.get(name.strip().casefold())
+
+
+class DirectoryStore:
+    """Custom directories kept in memory and in a JSON file
+
+    ``snapshot`` costs one stat call: the file is only re-read when its mtime
+    or size changes (e.g. another worker process wrote it). ``update`` holds a
+    thread lock and an exclusive lock on ``<path>.lock`` while it re-reads,
+    modifies and atomically replaces the file, so concurrent creates and
+    deletes don't lose each other's changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.current = DirectorySnapshot({}, None)
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def snapshot(self):
+        signature = self._signature()
+        current = self.current
+        if signature != current.version:
+            with self.lock:
+                signature = self._signature()
+                if signature != self.current.version:
+                    self.current = DirectorySnapshot(self._read(), signature)
+                current = self.current
+        return current
+
+    def update(self, change):
+        """Apply ``change(directories)`` to a fresh copy and save it; returns what ``change`` returns"""
+        with self.lock, open(f'{self.path}.lock', 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                directories = self._read()
+                result = change(directories)
+
+                temp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(temp_path, 'w') as f:
+                    json.dump(directories, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+                self.current = DirectorySnapshot(directories, self._signature())
+                return result
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,244 @@
+import time
+import sqlite3
+import threading
+import numpy as np
+from PIL import Image, ImageOps
+
+
+class ClipEncoder:
+    """CLIP image/text encoder on the CPU, loaded on first use
+
+    Returns L2-normalized float32 vectors, so a dot product is the cosine
+    similarity. ``available`` is False when torch/transformers are missing
+    or the model can't be loaded; callers then fall back to Gemini.
+    """
+
+    def __init__(self, model_name='openai/clip-vit-base-patch32'):
+        self.model_name = model_name
+        self.lock = threading.Lock()
+        self.load_seconds = None
+        self._model = None
+        self._processor = None
+        self._loaded = False
+
+    @property
+    def available(self):
+        if not self._loaded:
+            with self.lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    try:
+                        # Imported here so the app starts (and falls back to Gemini) without torch
+                        from transformers import CLIPModel, CLIPProcessor
+                        self._model = CLIPModel.from_pretrained(self.model_name).eval()
+                        self._processor = CLIPProcessor.from_pretrained(self.model_name)
+                        self.load_seconds = time.perf_counter() - start
+                        print(f"Embedding model {self.model_name} ready in {self.load_seconds:.2f}s")
+                    except Exception as e:
+                        print(f"Embedding model unavailable, using Gemini only: {e}")
+                        self._model = None
+                    self._loaded = True
+        return self._model is not None
+
+    def _normalize(self, features):
+        vectors = features.detach().numpy().astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def encode_images(self, sources):
+        import torch
+        images = []
+        for source in sources:
+            with Image.open(source) as image:
+                image.draft('RGB', (448, 448))
+                images.append(ImageOps.exif_transpose(image).convert('RGB'))
+        inputs = self._processor(images=images, return_tensors='pt')
+        with torch.inference_mode():
+            return self._normalize(self._model.get_image_features(**inputs))
+
+    def encode_texts(self, texts):
+        import torch
+        inputs = self._processor(text=texts, return_tensors='pt', padding=True, truncation=True)
+        with torch.inference_mode():
+            return self._normalize(self._model.get_text_features(**inputs))
+
+
+class EmbeddingClassifier:
+    """Chooses a custom directory for an image locally, from CLIP embeddings, when it's confident
+
+    Two signals, both a single matrix product over NumPy arrays:
+
+    * neighbours: the ``neighbours`` most similar organized images in current
+      custom directories; decides when they agree on a directory and are
+      on average at least ``image_similarity`` alike;
+    * directories: each directory's name and description, embedded once;
+      decides when one is clearly the best match (cosine similarity at least
+      ``text_margin`` above the runner-up) and close enough in absolute
+      terms (``text_similarity``). With a single directory there is nothing
+      to compare against, so it never decides alone.
+
+    Anything else is ambiguous and ``classify`` returns no category, so the
+    caller asks Gemini. Image embeddings are stored in SQLite and added as
+    images are organized; directory embeddings follow the directory
+    snapshot, so creating or deleting a directory only embeds or drops that
+    one.
+    """
+
+    def __init__(self, encoder, db_path, neighbours=5, image_similarity=0.85,
+                 text_margin=0.03, text_similarity=0.25):
+        self.encoder = encoder
+        self.neighbours = neighbours
+        self.image_similarity = image_similarity
+        self.text_margin = text_margin
+        self.text_similarity = text_similarity
+        self.lock = threading.Lock()
+        self.decided = {'neighbours': 0, 'directories': 0, 'ambiguous': 0, 'unavailable': 0}
+
+        # Directory name (case-folded) -> (text the embedding was made from, vector)
+        self.directories = {}
+        self.directories_version = None
+
+        # Image embeddings: one row per organized image, grown geometrically, with
+        # each row's category as an id so filtering by directory stays vectorized
+        self.keys = []
+        self.rows = {}  # key -> row
+        self.vectors = None
+        self.category_of = None
+        self.category_ids = {}  # category -> id
+        self.category_names = []
+        self.size = 0
+
+        self.db_path = db_path
+        self.local = threading.local()
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS embeddings (
+            key TEXT PRIMARY KEY, category TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL)''')
+        for key, category, vector in self.conn.execute('SELECT key, category, vector FROM embeddings WHERE model = ?',
+                                                       (encoder.model_name,)):
+            self._put(key, category, np.frombuffer(vector, dtype=np.float32))
+
+    @property
+    def conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+        return conn
+
+    def _put(self, key, category, vector):
+        row = self.rows.get(key)
+        if row is None:
+            if self.vectors is None:
+                self.vectors = np.zeros((64, vector.shape[0]), dtype=np.float32)
+                self.category_of = np.zeros(64, dtype=np.int32)
+            elif self.size == len(self.vectors):
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+                self.category_of = np.concatenate([self.category_of, np.zeros_like(self.category_of)])
+            row = self.rows[key] = self.size
+            self.keys.append(key)
+            self.size += 1
+        if category not in self.category_ids:
+            self.category_ids[category] = len(self.category_names)
+            self.category_names.append(category)
+        self.vectors[row] = vector
+        self.category_of[row] = self.category_ids[category]
+
+    def add(self, key, category, vector):
+        """Record the embedding of an organized image (``key`` is category/filename)"""
+        self.conn.execute('INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)',
+                          (key, category, self.encoder.model_name, vector.astype(np.float32).tobytes()))
+        with self.lock:
+            self._put(key, category, vector)
+
+    def remove(self, key):
+        self.conn.execute('DELETE FROM embeddings WHERE key = ?', (key,))
+        with self.lock:
+            row = self.rows.pop(key, None)
+            if row is None:
+                return
+            # Move the last row into the gap
+            last = self.size - 1
+            if row != last:
+                self.vectors[row] = self.vectors[last]
+                self.category_of[row] = self.category_of[last]
+                self.keys[row] = self.keys[last]
+                self.rows[self.keys[row]] = row
+            self.keys.pop()
+            self.size -= 1
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.rows
+
+    def sync_directories(self, snapshot):
+        """Embed directories that are new or re-described, and forget deleted ones"""
+        if snapshot.version == self.directories_version or not self.encoder.available:
+            return
+        wanted = {folded: f"a photo of {name}: {snapshot.descriptions[folded]}".strip().rstrip(':')
+                  for folded, name in snapshot.lookup.items()}
+        with self.lock:
+            missing = [folded for folded, text in wanted.items()
+                       if self.directories.get(folded, (None,))[0] != text]
+        vectors = self.encoder.encode_texts([wanted[folded] for folded in missing]) if missing else []
+        with self.lock:
+            for folded, vector in zip(missing, vectors):
+                self.directories[folded] = (wanted[folded], vector)
+            for folded in set(self.directories) - set(wanted):
+                del self.directories[folded]
+            self.directories_version = snapshot.version
+
+    def embed(self, image):
+        """The embedding of an image (path or file object), or None when no model is available"""
+        if not self.encoder.available:
+            return None
+        return self.encoder.encode_images([image])[0]
+
+    def classify(self, vector, snapshot):
+        """(category or None, how it was decided) for an embedded image"""
+        if vector is not None:
+            self.sync_directories(snapshot)
+        with self.lock:
+            if vector is None:
+                category, decided_by = None, 'unavailable'
+            else:
+                category, decided_by = (self._by_neighbours(vector, snapshot) or self._by_directories(vector, snapshot)
+                                        or (None, 'ambiguous'))
+            self.decided[decided_by] += 1
+        return category, decided_by
+
+    def _by_neighbours(self, vector, snapshot):
+        if not self.size:
+            return None
+        # Only images in directories that still exist can vote
+        current = np.array([name.casefold() in snapshot.lookup for name in self.category_names])
+        eligible = current[self.category_of[:self.size]]
+        count = int(eligible.sum())
+        if not count:
+            return None
+        # Scoring every row and masking out the rest avoids copying the matrix
+        similarities = self.vectors[:self.size] @ vector
+        similarities[~eligible] = -np.inf
+        k = min(self.neighbours, count)
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        labels = self.category_of[nearest]
+        winner = max(set(labels.tolist()), key=lambda label: similarities[nearest][labels == label].sum())
+        agreeing = similarities[nearest][labels == winner]
+        # Most neighbours must agree, and be close on average
+        if len(agreeing) * 2 > k and agreeing.mean() >= self.image_similarity:
+            return self.category_names[winner], 'neighbours'
+        return None
+
+    def _by_directories(self, vector, snapshot):
+        names = [name for name in self.directories if name in snapshot.lookup]
+        # A softmax over the prompts is always sure of a lone directory (or of one of
+        # a few close ones), so the raw cosine margin over the runner-up decides
+        if len(names) < 2:
+            return None
+        similarities = np.stack([self.directories[name][1] for name in names]) @ vector
+        runner_up, best = np.argsort(similarities)[-2:]
+        if (similarities[best] - similarities[runner_up] >= self.text_margin
+                and similarities[best] >= self.text_similarity):
+            return snapshot.lookup[names[best]].lower(), 'directories'
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {'decided_by': dict(self.decided), 'model': self.encoder.model_name, 'images': self.size,
+                    'directories': len(self.directories), 'load_seconds': self.encoder.load_seconds}
@@ -0,0 +1,41 @@
+"""Gunicorn settings for the image organizer, from the SERVER_* settings in config.py (.env)
+
+    gunicorn -c gunicorn.conf.py app:app
+
+(or ``python serve.py``). Command-line options override these settings.
+"""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+from config import Config
+
+# Config's paths are relative to this directory
+chdir = BASE_DIR
+bind = f'{Config.SERVER_HOST}:{Config.SERVER_PORT}'
+workers = Config.SERVER_WORKERS
+threads = Config.SERVER_THREADS
+worker_class = 'gthread'
+preload_app = Config.SERVER_PRELOAD
+timeout = Config.SERVER_TIMEOUT
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+
+
+def when_ready(server):
+    if server.cfg.preload_app:
+        import app
+        app.preload()
+
+
+def post_fork(server, worker):
+    import app
+    # Catching up on unindexed images is needed once, not once per worker
+    if worker.age == 1:
+        app.start_background_indexing()
+
+
+def worker_exit(server, worker):
+    # In-flight requests are done by now
+    import app
+    app.drain()
@@ -0,0 +1,53 @@
+"""Production server for the image organizer: gunicorn with the settings in gunicorn.conf.py
+
+    python serve.py [--host HOST] [--port PORT] [--workers N] [--threads N] [--no-preload]
+
+Options left out come from the SERVER_* settings in config.py.
+app.py itself runs Flask's development server.
+"""
+import os
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(BASE_DIR, 'gunicorn.conf.py')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image organizer server (gunicorn)")
+    parser.add_argument('--host', help='Interface to bind (default: SERVER_HOST)')
+    parser.add_argument('--port', type=int, help='Port to bind (default: SERVER_PORT)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: SERVER_WORKERS)')
+    parser.add_argument('--threads', type=int, help='Request threads per worker (default: SERVER_THREADS)')
+    parser.add_argument('--no-preload', action='store_true', help='Load the CLIP model in each worker instead of once')
+    args = parser.parse_args()
+
+    try:
+        from gunicorn.app.base import Application
+    except ImportError:
+        parser.error('gunicorn is not installed (pip install gunicorn); app.py runs the development server')
+
+    class ImageOrganizerServer(Application):
+        def load_config(self):
+            # Instead of gunicorn's own command line
+            self.load_config_from_file(CONFIG_FILE)
+            host, port = self.cfg.bind[0].rsplit(':', 1)
+            if args.host or args.port:
+                self.cfg.set('bind', [f'{args.host or host}:{args.port or port}'])
+            if args.workers:
+                self.cfg.set('workers', args.workers)
+            if args.threads:
+                self.cfg.set('threads', args.threads)
+            if args.no_preload:
+                self.cfg.set('preload_app', False)
+
+        def load(self):
+            from app import app
+            return app
+
+    # Paths in config.py are relative to this directory
+    os.chdir(BASE_DIR)
+    ImageOrganizerServer().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps, features
+
+
+class ThumbnailService:
+    """Content-addressed thumbnail cache with a background generator pool
+
+    Thumbnails are stored as ``<cache_dir>/<hash[:2]>/<hash>_<size>.<ext>``, so
+    identical images share them and a replaced file never gets a stale one.
+    Reads touch the file's mtime, and the oldest files are evicted once the
+    cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, sizes=(128, 256, 512), image_format='WEBP', quality=80,
+                 max_bytes=512 * 1024 * 1024, workers=2):
+        self.cache_dir = cache_dir
+        self.sizes = tuple(sizes)
+        # Fall back to JPEG on Pillow builds without WebP support
+        self.format = image_format.upper() if features.check(image_format.lower()) else 'JPEG'
+        self.extension = 'webp' if self.format == 'WEBP' else 'jpg'
+        self.mimetype = f'image/{self.format.lower()}'
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.evicting = False
+        self.counters = {'generated': 0, 'hits': 0, 'misses': 0, 'evicted': 0, 'errors': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(entry.stat().st_size for _, entry in self._entries())
+
+    def path_for(self, content_hash, size):
+        return os.path.join(self.cache_dir, content_hash[:2], f'{content_hash}_{size}.{self.extension}')
+
+    def schedule(self, source_path, content_hash):
+        """Queue every size for background generation (called after upload)"""
+        for size in self.sizes:
+            self._submit(source_path, content_hash, size)
+
+    def get(self, source_path, content_hash, size):
+        """Path of the thumbnail, generating it now if it isn't cached yet"""
+        path = self.path_for(content_hash, size)
+        if os.path.exists(path):
+            self._count('hits')
+            try:
+                os.utime(path)  # Mark as recently used for eviction
+            except OSError:
+                pass
+            return path
+        self._count('misses')
+        return self._submit(source_path, content_hash, size).result()
+
+    def _submit(self, source_path, content_hash, size):
+        # Requests for a thumbnail that is already being made wait on the same job
+        key = (content_hash, size)
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is None:
+                future = self.in_flight[key] = self.pool.submit(self._generate, source_path, content_hash, size)
+                future.add_done_callback(lambda _: self._finish(key))
+            return future
+
+    def _finish(self, key):
+        with self.lock:
+            self.in_flight.pop(key, None)
+
+    def _generate(self, source_path, content_hash, size):
+        path = self.path_for(content_hash, size)
+        if os.path.exists(path):
+            return path
+        try:
+            with Image.open(source_path) as image:
+                # Draft mode lets the JPEG decoder downscale by up to 8x while decoding
+                image.draft('RGB', (size, size))
+                thumbnail = ImageOps.exif_transpose(image)
+                thumbnail.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+            if self.format == 'JPEG' and thumbnail.mode != 'RGB':
+                thumbnail = thumbnail.convert('RGB')
+            elif thumbnail.mode not in ('RGB', 'RGBA'):
+                thumbnail = thumbnail.convert('RGBA' if 'transparency' in thumbnail.info else 'RGB')
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            thumbnail.save(temp_path, self.format, quality=self.quality)
+            os.replace(temp_path, path)
+        except Exception:
+            self._count('errors')
+            raise
+
+        written = os.path.getsize(path)
+        with self.lock:
+            self.counters['generated'] += 1
+            self.total_bytes += written
+            evict = self.total_bytes > self.max_bytes and not self.evicting
+            self.evicting = self.evicting or evict
+        if evict:
+            self.pool.submit(self._evict)
+        return path
+
+    def _entries(self):
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        yield shard, entry
+
+    def _evict(self):
+        """Delete least recently used thumbnails until the cache is back under 90% of max_bytes"""
+        try:
+            entries = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path) for _, entry in self._entries())
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            recent = time.time() - 10  # Just written or read: probably being served right now
+            evicted = 0
+            for mtime, size, path in entries:
+                if total <= target:
+                    break
+                if mtime > recent:
+                    continue
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            with self.lock:
+                self.total_bytes = total
+                self.counters['evicted'] += evicted
+        finally:
+            with self.lock:
+                self.evicting = False
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def close(self):
+        """Finish the thumbnails being generated and drop queued ones (they're made on first request)"""
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, 'bytes': self.total_bytes, 'max_bytes': self.max_bytes,
+                    'in_flight': len(self.in_flight), 'format': self.format, 'sizes': list(self.sizes)}
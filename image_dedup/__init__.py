@@ -0,0 +1,6 @@
+"""Perceptual-hash near-duplicate index shared by the ai-text-sorter and image-organizer backends."""
+from .hashing import phash, dhash, hamming
+from .bktree import BKTree
+from .index import DuplicateIndex
+
+__all__ = ['phash', 'dhash', 'hamming', 'BKTree', 'DuplicateIndex']
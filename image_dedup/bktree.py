@@ -0,0 +1,62 @@
+from .hashing import hamming
+
+
+class BKTree:
+    """Burkhard-Keller tree over integer hashes for Hamming-distance range queries
+
+    Each node holds one hash (and the keys stored under it) and keeps its
+    children by their distance to it, so by the triangle inequality a search
+    within ``max_distance`` only descends into children whose distance is
+    within ``max_distance`` of the query's distance to the node.
+    """
+
+    def __init__(self, distance=hamming):
+        self.distance = distance
+        self.root = None
+        self.size = 0
+
+    def add(self, value, key):
+        if self.root is None:
+            self.root = (value, {key}, {})
+            self.size += 1
+            return
+        node = self.root
+        while True:
+            d = self.distance(value, node[0])
+            if d == 0:
+                self.size += key not in node[1]
+                node[1].add(key)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = (value, {key}, {})
+                self.size += 1
+                return
+            node = child
+
+    def remove(self, value, key):
+        # Nodes stay in place (the tree is built around them); only the key goes
+        node = self.root
+        while node is not None:
+            d = self.distance(value, node[0])
+            if d == 0:
+                if key in node[1]:
+                    node[1].discard(key)
+                    self.size -= 1
+                return
+            node = node[2].get(d)
+
+    def search(self, value, max_distance):
+        """``[(distance, key)]`` of every stored key within ``max_distance``, nearest first"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = self.distance(value, node[0])
+            if d <= max_distance:
+                found.extend((d, key) for key in node[1])
+            stack.extend(child for edge, child in node[2].items() if d - max_distance <= edge <= d + max_distance)
+        return sorted(found)
+
+    def __len__(self):
+        return self.size
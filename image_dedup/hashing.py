@@ -0,0 +1,57 @@
+import math
+from functools import lru_cache
+
+from PIL import Image, ImageOps
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def _load(image, size):
+    """Grayscale ``size`` x ``size`` version of a path or PIL image, upright per its EXIF orientation"""
+    if not isinstance(image, Image.Image):
+        with Image.open(image) as opened:
+            # Lets the JPEG decoder downscale while decoding; we only need a few pixels
+            opened.draft('L', (size * 4, size * 4))
+            return _load(opened, size)
+    image = ImageOps.exif_transpose(image).convert('L')
+    return image.resize((size, size), Image.LANCZOS)
+
+
+def _bits(values, threshold):
+    value = 0
+    for v in values:
+        value = (value << 1) | (v > threshold)
+    return value
+
+
+def dhash(image, hash_size=8):
+    """Difference hash: one bit per horizontally adjacent pixel pair, ``hash_size ** 2`` bits"""
+    pixels = list(_load(image, hash_size + 1).resize((hash_size + 1, hash_size)).getdata())
+    width = hash_size + 1
+    return _bits((pixels[row * width + col] - pixels[row * width + col + 1]
+                  for row in range(hash_size) for col in range(hash_size)), 0)
+
+
+@lru_cache(maxsize=None)
+def _dct_table(size, coefficients):
+    return [[math.cos(math.pi * (2 * x + 1) * u / (2 * size)) for x in range(size)] for u in range(coefficients)]
+
+
+def phash(image, hash_size=8):
+    """DCT hash: the lowest ``hash_size`` x ``hash_size`` frequencies of a 4x larger thumbnail, vs their median
+
+    Only the needed coefficients are computed (a separable DCT over rows,
+    then columns), which keeps it fast without numpy.
+    """
+    size = hash_size * 4
+    pixels = list(_load(image, size).getdata())
+    table = _dct_table(size, hash_size)
+    rows = [[sum(p * c for p, c in zip(pixels[y * size:(y + 1) * size], table[u])) for u in range(hash_size)]
+            for y in range(size)]
+    coefficients = [sum(rows[y][u] * table[v][y] for y in range(size))
+                    for v in range(hash_size) for u in range(hash_size)]
+    # The DC term is the overall brightness and would dominate the median
+    median = sorted(coefficients[1:])[len(coefficients) // 2 - 1]
+    return _bits(coefficients, median)
@@ -0,0 +1,106 @@
+import os
+import json
+import sqlite3
+import threading
+
+from .bktree import BKTree
+from .hashing import phash
+
+
+class DuplicateIndex:
+    """Perceptual hashes of organized files, persisted in SQLite and searched through an in-memory BK-tree
+
+    ``find`` returns the nearest entry within ``max_distance`` bits that the
+    caller's ``accept`` check agrees is still usable (e.g. its file still
+    exists). Entries written by other processes are picked up on the next
+    lookup; entries they removed are filtered out by ``accept``.
+    """
+
+    def __init__(self, path, max_distance=4, hash_size=8):
+        self.path = path
+        self.max_distance = max_distance
+        self.hash_size = hash_size
+        self.lock = threading.Lock()
+        self.tree = BKTree()
+        self.hashes = {}  # key -> hash, for removal and replacement
+        self.last_id = 0
+        self.pid = None
+        self._conn = None
+        self.counters = {'lookups': 0, 'matches': 0, 'rejected': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS hashes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL UNIQUE,
+                hash TEXT NOT NULL,
+                payload TEXT NOT NULL)''')
+            self._sync()
+
+    @property
+    def conn(self):
+        # SQLite connections must not cross a fork, so each process opens its own
+        if self.pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            self.pid = os.getpid()
+        return self._conn
+
+    def hash_image(self, image):
+        return phash(image, self.hash_size)
+
+    def _sync(self):
+        rows = self.conn.execute('SELECT id, key, hash FROM hashes WHERE id > ? ORDER BY id', (self.last_id,))
+        for row_id, key, value in rows:
+            self._track(key, int(value, 16))
+            self.last_id = row_id
+
+    def _track(self, key, value):
+        previous = self.hashes.pop(key, None)
+        if previous is not None:
+            self.tree.remove(previous, key)
+        self.hashes[key] = value
+        self.tree.add(value, key)
+
+    def add(self, key, value, payload):
+        with self.lock:
+            # Replacing the row gives it a new id, so other processes see the change too. last_id is
+            # left alone: other processes may have inserted rows below this one that _sync hasn't read
+            self.conn.execute('INSERT OR REPLACE INTO hashes (key, hash, payload) VALUES (?, ?, ?)',
+                              (key, format(value, 'x'), json.dumps(payload)))
+            self._track(key, value)
+
+    def remove(self, key):
+        with self.lock:
+            self.conn.execute('DELETE FROM hashes WHERE key = ?', (key,))
+            value = self.hashes.pop(key, None)
+            if value is not None:
+                self.tree.remove(value, key)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.hashes
+
+    def find(self, value, accept=None):
+        """Payload of the nearest acceptable entry within ``max_distance``, or None"""
+        with self.lock:
+            self._sync()
+            candidates = self.tree.search(value, self.max_distance)
+            self.counters['lookups'] += 1
+        for distance, key in candidates:
+            with self.lock:
+                row = self.conn.execute('SELECT payload FROM hashes WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                continue
+            payload = json.loads(row[0])
+            if accept is None or accept(payload):
+                with self.lock:
+                    self.counters['matches'] += 1
+                return {**payload, 'distance': distance}
+            with self.lock:
+                self.counters['rejected'] += 1
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, 'entries': len(self.tree), 'max_distance': self.max_distance,
+                    'hash_bits': self.hash_size ** 2}
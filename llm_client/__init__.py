@@ -0,0 +1,5 @@
+"""Shared LLM client used by the ai-text-sorter, image-organizer and aura backends."""
+from .client import LLMClient, LLMError, LLMResponse, TokenBucket
+from .json_extract import JSONExtractor, extract_json
+
+__all__ = ['LLMClient', 'LLMError', 'LLMResponse', 'TokenBucket', 'JSONExtractor', 'extract_json']
@@ -0,0 +1,319 @@
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import httpx
+
+from .providers import ADAPTERS, DEFAULT_BASE_URLS
+from .json_extract import extract_json
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+SCHEMA_TYPES = {'object': dict, 'array': list}
+
+REPAIR_PROMPT = """Your previous reply could not be parsed as a JSON {kind}{schema}.
+Reply again with only the corrected JSON {kind} and no other text.
+
+Previous reply:
+---
+{reply}
+---"""
+
+
+class LLMError(Exception):
+    def __init__(self, message, status=None, retryable=False, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    provider: str
+    model: str
+    latency: float
+    usage: dict = field(default_factory=dict)
+    attempts: int = 1
+    hedged: bool = False
+
+
+class TokenBucket:
+    """Blocking token bucket: ``rate`` requests per second with bursts of ``burst``."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, rate or 0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class Provider:
+    def __init__(self, name, config):
+        self.name = name
+        self.kind = config.get('kind', 'openai')
+        self.adapter = ADAPTERS[self.kind]
+        self.base_url = config.get('base_url') or DEFAULT_BASE_URLS[self.kind]
+        self.api_key = config.get('api_key')
+        self.timeout = config.get('timeout', 60)
+        self.max_retries = config.get('max_retries', 3)
+        self.backoff_base = config.get('backoff_base', 0.5)
+        self.backoff_max = config.get('backoff_max', 20)
+        self.hedge_after = config.get('hedge_after')
+        self.semaphore = threading.BoundedSemaphore(config.get('max_concurrency', 8))
+        self.bucket = TokenBucket(config.get('rate_per_second'), config.get('burst'))
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=config.get('latency_window', 1000))
+        self.counters = {'calls': 0, 'errors': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                         'prompt_tokens': 0, 'completion_tokens': 0,
+                         'json_replies': 0, 'json_salvaged': 0, 'json_repairs': 0, 'json_repair_failures': 0}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def record(self, latency, usage):
+        with self.lock:
+            self.counters['calls'] += 1
+            self.counters['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            self.counters['completion_tokens'] += usage.get('completion_tokens', 0)
+            self.latencies.append(latency)
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = dict(self.counters)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4) if latencies else None
+
+        stats.update({'p50_seconds': percentile(0.50), 'p95_seconds': percentile(0.95),
+                      'p99_seconds': percentile(0.99),
+                      'json_repair_rate': round(stats['json_repairs'] / stats['json_replies'], 4)
+                      if stats['json_replies'] else None})
+        return stats
+
+
+class LLMClient:
+    """One pooled, rate-limited, retrying HTTP client for every LLM provider.
+
+    Each call acquires a token from the provider's bucket, then the global
+    and the per-provider concurrency semaphore. Transport errors, timeouts,
+    429s and 5xx responses are retried with capped exponential backoff and
+    full jitter, honouring ``Retry-After``. If a provider sets
+    ``hedge_after``, a second identical request is started when the first
+    hasn't answered in that many seconds, and whichever finishes first wins.
+    """
+
+    def __init__(self, config):
+        self.logger = logging.getLogger(__name__)
+        max_concurrency = config.get('max_concurrency', 16)
+        self.http = httpx.Client(
+            timeout=config.get('timeout', 60),
+            limits=httpx.Limits(max_connections=max_concurrency * 2,
+                                max_keepalive_connections=max_concurrency,
+                                keepalive_expiry=config.get('keepalive_expiry', 60)))
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.providers = {name: Provider(name, provider_config)
+                          for name, provider_config in config.get('providers', {}).items()}
+        self.hedge_pool = ThreadPoolExecutor(max_concurrency * 2, thread_name_prefix='llm-hedge')
+
+    def generate(self, provider, model, prompt, images=(), system=None, **options):
+        """Send one prompt (plus optional ``(mime_type, bytes)`` images) and return an LLMResponse."""
+        p = self.providers[provider]
+        request = p.adapter.build(p.base_url, p.api_key, model, prompt, images, system, options)
+
+        attempt = 0
+        while True:
+            try:
+                response = self._hedged(p, model, request)
+                response.attempts = attempt + 1
+                return response
+            except LLMError as e:
+                if not e.retryable or attempt >= p.max_retries:
+                    p.count('errors')
+                    raise
+                self._backoff(p, e, attempt)
+                attempt += 1
+
+    def generate_json(self, provider, model, prompt, schema=None, **options):
+        """Generate a reply that must be JSON and return ``(value, LLMResponse)``.
+
+        ``schema`` (a JSON Schema) is sent as the provider's structured-output
+        setting and fixes whether an object or an array is expected. The
+        first JSON value is pulled out of the reply even when it is wrapped in
+        prose or fences; when there is none, one repair call asks the model to
+        fix its own reply before an LLMError is raised.
+        """
+        p = self.providers[provider]
+        expect = SCHEMA_TYPES.get((schema or {}).get('type'))
+        response = self.generate(provider, model, prompt, json_schema=schema, **options)
+        value = self._parse_json(p, response.text, expect)
+        if value is not None:
+            return value, response
+
+        p.count('json_repairs')
+        kind = 'array' if expect is list else 'object'
+        repair_prompt = REPAIR_PROMPT.format(kind=kind, reply=response.text,
+                                             schema=f' matching this schema: {json.dumps(schema)}' if schema else '')
+        repaired = self.generate(provider, model, repair_prompt, json_schema=schema, **options)
+        value = self._parse_json(p, repaired.text, expect, repair=True)
+        if value is None:
+            p.count('json_repair_failures')
+            raise LLMError(f'{provider} reply is not valid JSON, even after a repair call: {response.text[:200]!r}')
+        return value, repaired
+
+    def _parse_json(self, p, text, expect, repair=False):
+        if not repair:
+            p.count('json_replies')
+        try:
+            value = json.loads(text)
+            if expect is None or isinstance(value, expect):
+                return value
+        except ValueError:
+            pass
+        value = extract_json(text, expect)
+        if value is not None and not repair:
+            p.count('json_salvaged')
+        return value
+
+    def stream(self, provider, model, prompt, images=(), system=None, **options):
+        """Like ``generate``, but yield the reply text in chunks as the provider produces it.
+
+        Failures are retried only until the first chunk has been yielded; after
+        that the error is raised to the caller. Hedging does not apply.
+        """
+        p = self.providers[provider]
+        request = p.adapter.build(p.base_url, p.api_key, model, prompt, images, system, options, stream=True)
+
+        attempt = 0
+        while True:
+            started = False
+            try:
+                for text in self._stream(p, request):
+                    started = True
+                    yield text
+                return
+            except LLMError as e:
+                if started or not e.retryable or attempt >= p.max_retries:
+                    p.count('errors')
+                    raise
+                self._backoff(p, e, attempt)
+                attempt += 1
+
+    def _backoff(self, p, error, attempt):
+        delay = error.retry_after if error.retry_after is not None else \
+            random.uniform(0, min(p.backoff_max, p.backoff_base * 2 ** attempt))
+        self.logger.warning(f"{p.name} call failed ({error}), retry {attempt + 1} in {delay:.2f}s")
+        p.count('retries')
+        time.sleep(delay)
+
+    def _hedged(self, p, model, request):
+        if not p.hedge_after:
+            return self._send(p, model, request)
+
+        first = self.hedge_pool.submit(self._send, p, model, request)
+        done, _ = wait([first], timeout=p.hedge_after)
+        if done:
+            return first.result()
+
+        p.count('hedges')
+        second = self.hedge_pool.submit(self._send, p, model, request)
+        remaining = [first, second]
+        error = None
+        while remaining:
+            done, _ = wait(remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                remaining.remove(future)
+                if future.exception() is None:
+                    response = future.result()
+                    response.hedged = True
+                    if future is second:
+                        p.count('hedge_wins')
+                    return response
+                error = future.exception()
+        raise error
+
+    def _send(self, p, model, request):
+        url, headers, body = request
+        p.bucket.acquire()
+        with self.semaphore, p.semaphore:
+            start = time.perf_counter()
+            try:
+                response = self.http.post(url, headers=headers, json=body, timeout=p.timeout)
+            except httpx.HTTPError as e:
+                raise LLMError(f'{type(e).__name__}: {e}', retryable=True)
+            latency = time.perf_counter() - start
+
+        if response.status_code >= 400:
+            raise self._http_error(response)
+        try:
+            text, usage = p.adapter.parse(response.json())
+        except (ValueError, KeyError, IndexError) as e:
+            raise LLMError(f'Unexpected {p.name} response: {e}', status=response.status_code)
+
+        p.record(latency, usage)
+        return LLMResponse(text=text, provider=p.name, model=model, latency=latency, usage=usage)
+
+    def _stream(self, p, request):
+        url, headers, body = request
+        p.bucket.acquire()
+        with self.semaphore, p.semaphore:
+            start = time.perf_counter()
+            usage = {}
+            try:
+                with self.http.stream('POST', url, headers=headers, json=body, timeout=p.timeout) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                        raise self._http_error(response)
+                    # Both providers stream server-sent events, one JSON chunk per data line
+                    for line in response.iter_lines():
+                        if not line.startswith('data:'):
+                            continue
+                        payload = line[len('data:'):].strip()
+                        if payload == '[DONE]':
+                            break
+                        try:
+                            text, chunk_usage = p.adapter.parse_chunk(json.loads(payload))
+                        except (ValueError, KeyError, IndexError) as e:
+                            raise LLMError(f'Unexpected {p.name} stream chunk: {e}', status=response.status_code)
+                        usage = chunk_usage or usage
+                        if text:
+                            yield text
+            except httpx.HTTPError as e:
+                raise LLMError(f'{type(e).__name__}: {e}', retryable=True)
+            p.record(time.perf_counter() - start, usage)
+
+    def _http_error(self, response):
+        retry_after = response.headers.get('retry-after')
+        return LLMError(f'HTTP {response.status_code}: {response.text[:300]}',
+                        status=response.status_code,
+                        retryable=response.status_code in RETRYABLE_STATUS,
+                        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+    def stats(self):
+        return {name: provider.stats() for name, provider in self.providers.items()}
+
+    def close(self):
+        self.hedge_pool.shutdown(wait=False)
+        self.http.close()
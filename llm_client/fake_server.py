@@ -0,0 +1,206 @@
+"""Local stand-in for the Perplexity and Gemini HTTP APIs.
+
+Serves OpenAI-style ``/chat/completions`` and Gemini-style
+``/models/<model>:generateContent`` (plus their streaming forms) with
+configurable latency, injected errors and malformed JSON replies, so the LLM client and the backends can be load-tested offline:
+
+    python -m llm_client.fake_server --port 8089 --latency-ms 800 --error-rate 0.05
+
+Then point a provider's ``base_url`` at ``http://127.0.0.1:8089``.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .json_extract import extract_json
+
+
+def fake_reply(prompt):
+    """Produce a plausible answer for the prompts the backends send."""
+    body = prompt.split('---')[1].strip() if prompt.count('---') >= 2 else prompt[:200]
+    if 'could not be parsed as a JSON' in prompt:
+        # Repair call: fix the single-quoted reply that malformed() produced
+        return json.dumps(extract_json(body.replace("'", '"')))
+    if 'JSON array' in prompt:
+        return json.dumps([{'title': f'Resource {i}', 'description': 'A fake suggestion.',
+                            'url': f'https://example.com/{i}'} for i in range(1, 4)])
+    if 'JSON object' in prompt:
+        return '```json\n' + json.dumps({'corrected_text': body, 'autocompleted_notes': body,
+                                         'summary': body[:120] or 'Summary'}) + '\n```'
+    if 'summary of the key concepts' in prompt:
+        return body[:120] or 'Summary'
+    if 'Raw Text:' in prompt:
+        return body
+    directories = re.findall(r'^\s*- ([^:\n]+):', prompt, re.MULTILINE)
+    if directories:
+        return directories[0]
+    match = re.search(r'OCR Text:(.*?)\n\s*\n', prompt, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    if 'Extract all the handwritten text' in prompt:
+        return 'Photosynthesis converts light energy into chemical energy in plants.'
+    return prompt[:200]
+
+
+def shape_reply(text, json_mode, malformed_rate):
+    """Apply structured-output mode, then maybe break the JSON the way models do."""
+    value = extract_json(text)
+    if value is None:
+        return text
+    if random.random() < malformed_rate:
+        return 'Sure! Here is the result:\n' + repr(value)
+    return json.dumps(value) if json_mode else text
+
+
+def split_tokens(text):
+    """Split a reply into word-sized stream chunks that join back to the exact text."""
+    return re.findall(r'\S+\s*|\s+', text) or ['']
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_events(self, chunks):
+        # Server-sent events without a Content-Length: the body ends when the connection closes
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for chunk in chunks:
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(self.server.token_delay)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        self.server.count('requests')
+
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+        roll = random.random()
+        if roll < server.rate_limit_rate:
+            server.count('rate_limited')
+            return self._send_json(429, {'error': {'message': 'Rate limited (fake)'}}, {'Retry-After': '1'})
+        if roll < server.rate_limit_rate + server.error_rate:
+            server.count('errors')
+            return self._send_json(500, {'error': {'message': 'Injected failure (fake)'}})
+
+        if self.path.rstrip('/').endswith('/chat/completions'):
+            prompt = '\n'.join(m['content'] if isinstance(m['content'], str) else
+                               ' '.join(part.get('text', '') for part in m['content'])
+                               for m in request.get('messages', []) if m.get('role') == 'user')
+            text = shape_reply(fake_reply(prompt), 'response_format' in request, server.malformed_rate)
+            usage = {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(text.split())}
+            if request.get('stream'):
+                chunks = [{'choices': [{'index': 0, 'delta': {'content': token}}]} for token in split_tokens(text)]
+                chunks.append({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}], 'usage': usage})
+                self._send_events(chunks)
+                return self.wfile.write(b'data: [DONE]\n\n')
+            return self._send_json(200, {
+                'id': 'fake', 'object': 'chat.completion', 'model': request.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text},
+                             'finish_reason': 'stop'}],
+                'usage': usage})
+
+        if ':generateContent' in self.path or ':streamGenerateContent' in self.path:
+            prompt = ' '.join(part.get('text', '') for content in request.get('contents', [])
+                              for part in content.get('parts', []))
+            json_mode = request.get('generationConfig', {}).get('responseMimeType') == 'application/json'
+            text = shape_reply(fake_reply(prompt), json_mode, server.malformed_rate)
+            if ':streamGenerateContent' in self.path:
+                chunks = [{'candidates': [{'content': {'role': 'model', 'parts': [{'text': token}]}}]}
+                          for token in split_tokens(text)]
+                chunks[-1]['usageMetadata'] = {'promptTokenCount': len(prompt.split()),
+                                               'candidatesTokenCount': len(text.split())}
+                return self._send_events(chunks)
+            return self._send_json(200, {
+                'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+                'usageMetadata': {'promptTokenCount': len(prompt.split()),
+                                  'candidatesTokenCount': len(text.split())}})
+
+        self._send_json(404, {'error': {'message': f'Unknown fake endpoint {self.path}'}})
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, jitter=0.1, error_rate=0.0, rate_limit_rate=0.0, verbose=False,
+                 token_delay=0.02, malformed_rate=0.0):
+        super().__init__(address, FakeProviderHandler)
+        self.malformed_rate = malformed_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'rate_limited': 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def handle_error(self, request, client_address):
+        # Clients dropping pooled keep-alive connections is routine here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def start_background(self):
+        thread = threading.Thread(target=self.serve_forever, name='fake-llm-provider', daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Perplexity/Gemini provider for offline load tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=500)
+    parser.add_argument('--jitter-ms', type=float, default=100)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction answered with 429')
+    parser.add_argument('--malformed-rate', type=float, default=0.0,
+                        help='Fraction of JSON replies sent as unparseable prose')
+    parser.add_argument('--token-delay-ms', type=float, default=20, help='Delay between streamed chunks')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    server = FakeProviderServer((args.host, args.port), args.latency_ms / 1000, args.jitter_ms / 1000,
+                                args.error_rate, args.rate_limit_rate, args.verbose, args.token_delay_ms / 1000,
+                                args.malformed_rate)
+    print(f'Fake LLM provider listening on {server.base_url}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import re
+import json
+
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+CLOSERS = {'{': '}', '[': ']'}
+
+
+def _loads(text):
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        # Models like to leave a comma before the closing bracket
+        return json.loads(TRAILING_COMMA_RE.sub(r'\1', text), strict=False)
+
+
+class JSONExtractor:
+    """Pulls the first valid JSON object or array out of an LLM reply.
+
+    Feed the reply in chunks as it streams. ``feed`` returns the value as soon
+    as a complete one has been seen, so the rest of the stream can be ignored.
+    Prose, code fences and stray brackets around the JSON are skipped. If the
+    reply stops early, ``finish`` closes whatever is still open, dropping an
+    unfinished trailing member. ``expect`` (``dict`` or ``list``) skips
+    candidates of the other type.
+    """
+
+    def __init__(self, expect=None):
+        self.expect = expect
+        self.buffer = ''
+        self.value = None
+        self.found = False
+        self._reset(0)
+
+    def _reset(self, position):
+        self.scan = position
+        self.start = None
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.last_comma = None
+
+    def feed(self, chunk):
+        if self.found:
+            return self.value
+        self.buffer += chunk
+        while self.scan < len(self.buffer):
+            char = self.buffer[self.scan]
+            self.scan += 1
+            if self.start is None:
+                if char in CLOSERS and (self.expect is None or (char == '{') == (self.expect is dict)):
+                    self.start = self.scan - 1
+                    self.stack.append(char)
+                continue
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in CLOSERS:
+                self.stack.append(char)
+            elif char in '}]':
+                if CLOSERS[self.stack[-1]] != char:
+                    self._reset(self.start + 1)
+                    continue
+                self.stack.pop()
+                if not self.stack and self._accept(self.buffer[self.start:self.scan]):
+                    return self.value
+            elif char == ',':
+                self.last_comma = (self.scan - 1, list(self.stack))
+        return None
+
+    def _accept(self, candidate):
+        try:
+            value = _loads(candidate)
+        except ValueError:
+            # Not JSON after all (e.g. "[see note]" in prose); look again after this opening bracket
+            self._reset(self.start + 1)
+            return False
+        self.value, self.found = value, True
+        return True
+
+    def finish(self):
+        """Return the extracted value, salvaging a truncated one if possible, or None."""
+        if self.found or self.start is None:
+            return self.value
+        attempts = [self.buffer[self.start:] + ('"' if self.in_string else '') + self._closers(self.stack)]
+        if self.last_comma:
+            position, stack = self.last_comma
+            attempts.append(self.buffer[self.start:position] + self._closers(stack))
+        for candidate in attempts:
+            try:
+                self.value, self.found = _loads(candidate), True
+                return self.value
+            except ValueError:
+                continue
+        return None
+
+    @staticmethod
+    def _closers(stack):
+        return ''.join(CLOSERS[opener] for opener in reversed(stack))
+
+
+def extract_json(text, expect=None):
+    """Return the first JSON object or array in ``text`` (salvaging a truncated one), or None."""
+    extractor = JSONExtractor(expect)
+    value = extractor.feed(text)
+    return value if extractor.found else extractor.finish()
@@ -0,0 +1,69 @@
+"""Load-test LLMClient against the fake provider, fully offline.
+
+    python -m llm_client.loadtest --requests 500 --concurrency 32 --latency-ms 300 --error-rate 0.05
+
+Starts a FakeProviderServer on a free port unless ``--base-url`` is given and
+prints throughput plus the client's per-provider metrics as JSON.
+"""
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import LLMClient, LLMError
+from .fake_server import FakeProviderServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline load test for the shared LLM client')
+    parser.add_argument('--kind', default='openai', choices=['openai', 'gemini'])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--base-url', help='Use an already running (fake) provider')
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--jitter-ms', type=float, default=150)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--provider-concurrency', type=int, default=8)
+    parser.add_argument('--rate-per-second', type=float, default=None)
+    parser.add_argument('--hedge-after', type=float, default=None)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = FakeProviderServer(('127.0.0.1', 0), args.latency_ms / 1000, args.jitter_ms / 1000,
+                                    args.error_rate, args.rate_limit_rate)
+        server.start_background()
+        base_url = server.base_url
+
+    client = LLMClient({
+        'max_concurrency': args.concurrency,
+        'providers': {'fake': {'kind': args.kind, 'base_url': base_url, 'api_key': 'fake',
+                               'max_concurrency': args.provider_concurrency,
+                               'rate_per_second': args.rate_per_second,
+                               'hedge_after': args.hedge_after, 'backoff_base': 0.05}}})
+
+    def one(i):
+        try:
+            client.generate('fake', 'fake-model', f'OCR Text: request {i}\n\nfix it')
+            return True
+        except LLMError:
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        succeeded = sum(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    report = {'requests': args.requests, 'succeeded': succeeded, 'elapsed_seconds': round(elapsed, 3),
+              'requests_per_second': round(args.requests / elapsed, 2), 'client': client.stats()['fake']}
+    if server:
+        report['server'] = dict(server.counters)
+        server.shutdown()
+    client.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
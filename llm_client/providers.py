@@ -0,0 +1,107 @@
+import base64
+
+
+def encode_image(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def gemini_schema(schema):
+    """Translate a JSON Schema into the OpenAPI subset Gemini's responseSchema accepts."""
+    converted = {key: schema[key] for key in ('description', 'enum', 'required') if key in schema}
+    converted['type'] = schema['type'].upper()
+    if 'properties' in schema:
+        converted['properties'] = {name: gemini_schema(value) for name, value in schema['properties'].items()}
+    if 'items' in schema:
+        converted['items'] = gemini_schema(schema['items'])
+    return converted
+
+
+class OpenAIChatAdapter:
+    """OpenAI-compatible /chat/completions (used for Perplexity)."""
+
+    def build(self, base_url, api_key, model, prompt, images=(), system=None, options=None, stream=False):
+        options = options or {}
+        content = prompt
+        if images:
+            content = [{'type': 'text', 'text': prompt}] + [
+                {'type': 'image_url', 'image_url': {'url': f'data:{mime};base64,{encode_image(data)}'}}
+                for mime, data in images]
+        messages = [{'role': 'system', 'content': system}] if system else []
+        messages.append({'role': 'user', 'content': content})
+
+        body = {'model': model, 'messages': messages}
+        if options.get('max_tokens'):
+            body['max_tokens'] = options['max_tokens']
+        if options.get('temperature') is not None:
+            body['temperature'] = options['temperature']
+        if options.get('json_schema'):
+            body['response_format'] = {'type': 'json_schema',
+                                       'json_schema': {'name': 'response', 'schema': options['json_schema']}}
+        if stream:
+            body['stream'] = True
+        return f'{base_url}/chat/completions', {'Authorization': f'Bearer {api_key}'}, body
+
+    def parse(self, data):
+        text = data['choices'][0]['message']['content'] or ''
+        usage = data.get('usage') or {}
+        return text, {'prompt_tokens': usage.get('prompt_tokens', 0),
+                      'completion_tokens': usage.get('completion_tokens', 0)}
+
+    def parse_chunk(self, data):
+        choices = data.get('choices') or [{}]
+        text = (choices[0].get('delta') or {}).get('content') or ''
+        usage = data.get('usage') or {}
+        return text, {'prompt_tokens': usage['prompt_tokens'],
+                      'completion_tokens': usage['completion_tokens']} if usage else {}
+
+
+class GeminiAdapter:
+    """Gemini REST generateContent."""
+
+    def build(self, base_url, api_key, model, prompt, images=(), system=None, options=None, stream=False):
+        options = options or {}
+        parts = [{'text': prompt}] + [{'inlineData': {'mimeType': mime, 'data': encode_image(data)}}
+                                      for mime, data in images]
+        body = {'contents': [{'role': 'user', 'parts': parts}]}
+        if system:
+            body['systemInstruction'] = {'parts': [{'text': system}]}
+
+        generation_config = {}
+        if options.get('max_tokens'):
+            generation_config['maxOutputTokens'] = options['max_tokens']
+        if options.get('temperature') is not None:
+            generation_config['temperature'] = options['temperature']
+        if options.get('json_schema'):
+            generation_config['responseMimeType'] = 'application/json'
+            generation_config['responseSchema'] = gemini_schema(options['json_schema'])
+        if generation_config:
+            body['generationConfig'] = generation_config
+        method = 'streamGenerateContent?alt=sse' if stream else 'generateContent'
+        return f'{base_url}/models/{model}:{method}', {'x-goog-api-key': api_key}, body
+
+    def parse(self, data):
+        candidates = data.get('candidates') or []
+        if not candidates:
+            feedback = data.get('promptFeedback', {})
+            raise ValueError(f"Gemini returned no candidates: {feedback.get('blockReason', 'unknown reason')}")
+        parts = candidates[0].get('content', {}).get('parts', [])
+        usage = data.get('usageMetadata') or {}
+        return ''.join(part.get('text', '') for part in parts), {
+            'prompt_tokens': usage.get('promptTokenCount', 0),
+            'completion_tokens': usage.get('candidatesTokenCount', 0)}
+
+    def parse_chunk(self, data):
+        # Every streamed chunk is a partial generateContent response
+        text, usage = self.parse(data)
+        return text, usage if data.get('usageMetadata') else {}
+
+
+ADAPTERS = {
+    'openai': OpenAIChatAdapter(),
+    'gemini': GeminiAdapter(),
+}
+
+DEFAULT_BASE_URLS = {
+    'openai': 'https://api.perplexity.ai',
+    'gemini': 'https://generativelanguage.googleapis.com/v1beta',
+}
@@ -0,0 +1,4 @@
+"""Streams Flask uploads straight into a staging file, hashing on the way, for the ai-text-sorter and image-organizer backends."""
+from .staging import StagedUpload, staging_request_class, place_file, reclaim_stale
+
+__all__ = ['StagedUpload', 'staging_request_class', 'place_file', 'reclaim_stale']
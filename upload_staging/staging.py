@@ -0,0 +1,153 @@
+import os
+import errno
+import time
+import shutil
+import hashlib
+import tempfile
+
+from flask import Request
+
+STAGING_PREFIX = '.upload-'
+# os.link errors that mean "copy instead": another filesystem, or no hard links there
+LINK_UNSUPPORTED = (errno.EXDEV, errno.EPERM, errno.ENOTSUP)
+
+
+class StagedUpload:
+    """Writable file for one uploaded file, created in the upload folder while the request is parsed
+
+    Every chunk is hashed (SHA-256) as it is written, and kept in memory too
+    when the whole request is small enough, so the app never has to read the
+    file back to hash or decode it. The file is the upload's only copy on
+    disk: ``place_file`` links or renames it into its final location.
+    Anything else behaves like the underlying file object.
+    """
+
+    def __init__(self, directory, keep_in_memory=False):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix=STAGING_PREFIX)
+        self.file = os.fdopen(fd, 'w+b')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.memory = bytearray() if keep_in_memory else None
+
+    def write(self, chunk):
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        if self.memory is not None:
+            self.memory += chunk
+        return self.file.write(chunk)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    @property
+    def sha256(self):
+        return self.digest.hexdigest()
+
+    @property
+    def data(self):
+        """The upload's bytes if they were kept in memory, else None"""
+        return bytes(self.memory) if self.memory is not None else None
+
+    def finish(self):
+        """Flush and close the file so it can be placed; returns its path"""
+        if not self.file.closed:
+            self.file.close()
+        return self.path
+
+    def discard(self):
+        """Delete the file, unless it was already moved into place"""
+        self.finish()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def staging_request_class(upload_folder, memory_limit=0):
+    """Flask request class whose uploaded files are ``StagedUpload``s in ``upload_folder``
+
+    Files are kept in memory as well when the request body is at most
+    ``memory_limit`` bytes. Staged files the view didn't move into place
+    (``place_file`` or a rename) are deleted when the request ends.
+    """
+    class StagingRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            staged = StagedUpload(upload_folder, bool(total_content_length and total_content_length <= memory_limit))
+            self.staged_uploads = getattr(self, 'staged_uploads', []) + [staged]
+            return staged
+
+        def close(self):
+            super().close()
+            for staged in getattr(self, 'staged_uploads', []):
+                staged.discard()
+
+    return StagingRequest
+
+
+def place_file(source_path, directory, filename, keep_source=False):
+    """Hard-link a file into ``directory`` under a free name, then drop the source; returns the name used
+
+    Linking fails instead of overwriting when another upload took the name in
+    the meantime, and the file only appears once complete. Nothing is copied
+    unless the two paths are on different filesystems. ``keep_source``
+    leaves the source in place (to share an identical file).
+    """
+    name, ext = os.path.splitext(filename)
+    candidate, counter = filename, 1
+    while True:
+        target = os.path.join(directory, candidate)
+        try:
+            os.link(source_path, target)
+            break
+        except FileExistsError:
+            candidate = f"{name}_{counter}{ext}"
+            counter += 1
+        except OSError as e:
+            if e.errno not in LINK_UNSUPPORTED:
+                raise
+            # Different filesystem (or no hard links): reserve the name, then copy over it
+            try:
+                with open(target, 'xb'):
+                    pass
+            except FileExistsError:
+                candidate = f"{name}_{counter}{ext}"
+                counter += 1
+                continue
+            try:
+                shutil.copy2(source_path, target)
+            except BaseException:
+                os.remove(target)
+                raise
+            break
+    if not keep_source:
+        os.remove(source_path)
+    return candidate
+
+
+def reclaim_stale(directory, max_age, names=None):
+    """Delete staging leftovers (and files ``names(filename)`` accepts) older than ``max_age`` seconds
+
+    Returns the number of bytes freed.
+    """
+    cutoff = time.time() - max_age
+    freed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            staging = entry.name.startswith(STAGING_PREFIX)
+            if not (staging or names):
+                continue
+            try:
+                # Age first: ``names`` may be expensive (e.g. hash the file) and young files are kept anyway
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime >= cutoff or not (staging or names(entry.name)):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    os.remove(entry.path)
+                else:
+                    continue
+                freed += stat.st_size
+            except OSError:
+                continue
+    return freed